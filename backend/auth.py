@@ -1,17 +1,27 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, ExpiredSignatureError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 import models
 from database import get_db
+from hashing import HashingBusy, hash_password, verify_and_update_password
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int((os.getenv(name) or '').strip() or default)
+    except ValueError:
+        return default
+
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM = "HS256"
@@ -19,16 +29,31 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
-# Use pbkdf2_sha256 to avoid bcrypt backend issues and the 72-byte bcrypt limit.
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервер перегружен, попробуйте ещё раз через несколько секунд",
+        headers={"Retry-After": "2"},
+    )
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update(plain_password, hashed_password)[0]
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Check a password on the hash pool; also returns a new hash if the parameters changed."""
+    try:
+        return verify_and_update_password(plain_password, hashed_password)
+    except HashingBusy:
+        raise _hashing_busy()
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    try:
+        return hash_password(password)
+    except HashingBusy:
+        raise _hashing_busy()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -38,10 +63,102 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+# Columns every authenticated request gets without touching the rest of the users row
+# (avatar in particular can be a large data URL).
+PRINCIPAL_COLUMNS = ("id", "email", "username", "full_name", "color", "created_at")
+
+
+class PrincipalCache:
+    """Bounded TTL map from a token subject to the user's principal columns.
+
+    Per process: writes in this worker call forget_user(), edits made through another
+    worker become visible here after at most ttl seconds.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = max(0, ttl)
+        self.max_entries = max(0, max_entries)
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, subject: str, fields: dict) -> None:
+        if not self.ttl or not self.max_entries:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, fields)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget_user(self, user_id: int) -> None:
+        # Tokens may carry the id or the (old) username, so drop every subject of the user.
+        with self._lock:
+            for subject in [key for key, (_, fields) in self._entries.items() if fields["id"] == user_id]:
+                del self._entries[subject]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+principal_cache = PrincipalCache(
+    ttl=_env_int("OPENTIME_AUTH_CACHE_TTL", 30),
+    max_entries=_env_int("OPENTIME_AUTH_CACHE_SIZE", 10000),
+)
+
+
+class Principal:
+    """The authenticated user handed to endpoints.
+
+    Carries PRINCIPAL_COLUMNS; any other attribute loads the ORM row from the request's
+    session on first access. Endpoints that modify the user call load() and write to it.
+    """
+
+    def __init__(self, fields: dict, db: Session):
+        self.__dict__.update(fields)
+        self._db = db
+        self._row: Optional[models.User] = None
+
+    def load(self) -> models.User:
+        if self._row is None:
+            self._row = self._db.get(models.User, self.id)
+            if self._row is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Неверные учетные данные",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+        return self._row
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
-) -> models.User:
+) -> Principal:
+    return user_from_token(token, db)
+
+
+def user_from_token(token: str, db: Session) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Неверные учетные данные",
@@ -64,10 +181,16 @@ def get_current_user(
     if not subject:
         raise credentials_exception
 
-    if str(subject).isdigit():
-        user = db.query(models.User).filter(models.User.id == int(subject)).first()
-    else:
-        user = db.query(models.User).filter(models.User.username == subject).first()
-    if not user:
-        raise credentials_exception
-    return user
+    subject = str(subject)
+    fields = principal_cache.get(subject)
+    if fields is None:
+        query = db.query(*(getattr(models.User, name) for name in PRINCIPAL_COLUMNS))
+        if subject.isdigit():
+            row = query.filter(models.User.id == int(subject)).first()
+        else:
+            row = query.filter(models.User.username == subject).first()
+        if not row:
+            raise credentials_exception
+        fields = dict(zip(PRINCIPAL_COLUMNS, row))
+        principal_cache.set(subject, fields)
+    return Principal(fields, db)
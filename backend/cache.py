@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int((os.getenv(name) or '').strip() or default)
+    except ValueError:
+        return default
+
+
+class CacheBackend:
+    """Byte-oriented storage behind the response caches.
+
+    Values are opaque bytes and every entry carries tags, so a shared store
+    (Redis, memcached) can implement the same contract for multi-worker setups.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = ()) -> None:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process LRU bounded by the total size of the stored values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: OrderedDict[str, tuple[bytes, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._size = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = ()) -> None:
+        if len(value) > self.max_bytes:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, tags)
+            self._size += len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        value, tags = entry
+        self._size -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class MonthGridCache:
+    """Serialized month payloads of GET /api/events keyed by (group_id, year, month).
+
+    Writers invalidate the months they touch after committing. A per-month generation
+    counter stops a reader that started before an invalidation from storing stale data.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend]):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def month_tag(group_id: int, year: int, month: int) -> str:
+        return f"month:{int(group_id)}:{int(year):04d}-{int(month):02d}"
+
+    @staticmethod
+    def group_tag(group_id: int) -> str:
+        return f"group:{int(group_id)}"
+
+    def generation(self, group_id: int, year: int, month: int) -> tuple[int, int]:
+        with self._lock:
+            return (
+                self._generations.get(self.month_tag(group_id, year, month), 0),
+                self._generations.get(self.group_tag(group_id), 0),
+            )
+
+    def get(self, group_id: int, year: int, month: int, variant: str = "") -> Optional[bytes]:
+        if self.backend is None:
+            return None
+        value = self.backend.get(f"{self.month_tag(group_id, year, month)}:{variant}")
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, group_id: int, year: int, month: int, value: bytes, generation: tuple[int, int], variant: str = "") -> None:
+        if self.backend is None or self.generation(group_id, year, month) != generation:
+            return
+        month_tag = self.month_tag(group_id, year, month)
+        self.backend.set(f"{month_tag}:{variant}", value, (month_tag, self.group_tag(group_id)))
+
+    def invalidate_month(self, group_id: int, year: int, month: int) -> None:
+        self._invalidate([self.month_tag(group_id, year, month)])
+
+    def invalidate_dates(self, group_id: int, *dates) -> None:
+        self._invalidate(sorted({self.month_tag(group_id, d.year, d.month) for d in dates if d}))
+
+    def invalidate_groups(self, group_ids: Iterable[int]) -> None:
+        self._invalidate([self.group_tag(gid) for gid in group_ids if gid])
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = {"enabled": self.enabled, "hits": self.hits, "misses": self.misses}
+        if self.backend is not None:
+            data.update(self.backend.stats())
+        return data
+
+    def _invalidate(self, tags: list[str]) -> None:
+        if not tags:
+            return
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+        if self.backend is not None:
+            self.backend.invalidate_tags(tags)
+
+
+MONTH_CACHE_MAX_BYTES = _env_int('OPENTIME_MONTH_CACHE_BYTES', 32 * 1024 * 1024)
+
+month_cache = MonthGridCache(LRUCacheBackend(MONTH_CACHE_MAX_BYTES) if MONTH_CACHE_MAX_BYTES > 0 else None)
@@ -2,6 +2,8 @@ import os
 import ssl
 import smtplib
 import socket
+import threading
+import time
 from pathlib import Path
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
@@ -21,9 +23,25 @@ SMTP_FROM = _env('SMTP_FROM', SMTP_USER)
 SMTP_SECURITY = _env('SMTP_SECURITY', 'auto').lower()
 SMTP_TIMEOUT = int(_env('SMTP_TIMEOUT', '12') or '12')
 SMTP_FORCE_IPV4 = _env('SMTP_FORCE_IPV4', '1').lower() in {'1', 'true', 'yes', 'on'}
+SMTP_DNS_TTL = int(_env('SMTP_DNS_TTL', '300') or '300')
+SMTP_KEEPALIVE_SECONDS = int(_env('SMTP_KEEPALIVE_SECONDS', '30') or '30')
+SMTP_IDLE_SECONDS = int(_env('SMTP_IDLE_SECONDS', '600') or '600')
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+
+
+def smtp_configured() -> bool:
+    # 'plain' is only for a local relay or test stand-in, which usually has no AUTH.
+    return bool(SMTP_USER and SMTP_PASSWORD) or SMTP_SECURITY == 'plain'
 
 
 def _resolve_addresses(host: str, port: int):
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get((host, port))
+    if cached and cached[0] > now:
+        return cached[1]
     family = socket.AF_INET if SMTP_FORCE_IPV4 else socket.AF_UNSPEC
     infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
     seen = set()
@@ -38,9 +56,16 @@ def _resolve_addresses(host: str, port: int):
         addrs.append((info[0], ip, port))
     if not addrs:
         raise RuntimeError(f'Не удалось разрешить адрес {host}:{port}')
+    with _dns_lock:
+        _dns_cache[(host, port)] = (now + SMTP_DNS_TTL, addrs)
     return addrs
 
 
+def _forget_addresses(host: str, port: int) -> None:
+    with _dns_lock:
+        _dns_cache.pop((host, port), None)
+
+
 def _build_message(email: str, code: str) -> MIMEText:
     subject = 'OpenTime — Сброс пароля'
     body = f'''Здравствуйте!\n\nВы запросили сброс пароля в приложении OpenTime.\n\nВаш код подтверждения: {code}\n\nЕсли вы не запрашивали сброс пароля — просто проигнорируйте это письмо.\n\nOpenTime\n'''
@@ -107,63 +132,186 @@ def _connect_starttls_via_ip(host: str, port: int):
     raise RuntimeError(' ; '.join(attempts)) from last_error
 
 
-def _send_via(security: str, host: str, port: int, msg: MIMEText):
+def _connect_plain_via_ip(host: str, port: int):
+    last_error = None
+    attempts = []
+    for family, ip, resolved_port in _resolve_addresses(host, port):
+        server = smtplib.SMTP(timeout=SMTP_TIMEOUT)
+        try:
+            server.connect(ip, resolved_port)
+            server.ehlo()
+            attempts.append(f'plain:{ip}:{resolved_port}=ok')
+            return server, attempts
+        except Exception as exc:
+            last_error = exc
+            attempts.append(f'plain:{ip}:{resolved_port}={exc}')
+            _close(server)
+    raise RuntimeError(' ; '.join(attempts)) from last_error
+
+
+def _close(server) -> None:
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+def _open_via(security: str, host: str, port: int):
     if security == 'ssl':
         server, attempts = _connect_ssl_via_ip(host, port)
     elif security == 'starttls':
         server, attempts = _connect_starttls_via_ip(host, port)
+    elif security == 'plain':
+        server, attempts = _connect_plain_via_ip(host, port)
     else:
         raise ValueError(f'Неизвестный режим SMTP: {security}')
 
     try:
-        server.login(SMTP_USER, SMTP_PASSWORD)
-        server.send_message(msg)
-        return attempts
-    finally:
-        try:
-            server.quit()
-        except Exception:
-            try:
-                server.close()
-            except Exception:
-                pass
-
+        if SMTP_USER and SMTP_PASSWORD:
+            server.login(SMTP_USER, SMTP_PASSWORD)
+        return server, attempts
+    except Exception:
+        _close(server)
+        raise
 
-def send_reset_email(email: str, code: str):
-    if not SMTP_USER or not SMTP_PASSWORD:
-        raise RuntimeError('SMTP не настроен: проверь SMTP_USER и SMTP_PASSWORD в backend/.env')
-
-    msg = _build_message(email, code)
-    attempts = []
 
-    if SMTP_SECURITY == 'ssl':
-        variants = [('ssl', SMTP_PORT)]
-    elif SMTP_SECURITY == 'starttls':
-        variants = [('starttls', SMTP_PORT)]
+def _security_variants():
+    if SMTP_SECURITY in {'ssl', 'starttls', 'plain'}:
+        return [(SMTP_SECURITY, SMTP_PORT)]
+    variants = []
+    if SMTP_PORT == 465:
+        variants.append(('ssl', 465))
+        variants.append(('starttls', 587))
+    elif SMTP_PORT == 587:
+        variants.append(('starttls', 587))
+        variants.append(('ssl', 465))
     else:
-        variants = []
-        if SMTP_PORT == 465:
+        variants.append(('ssl', SMTP_PORT))
+        variants.append(('starttls', SMTP_PORT))
+        if SMTP_PORT != 465:
             variants.append(('ssl', 465))
+        if SMTP_PORT != 587:
             variants.append(('starttls', 587))
-        elif SMTP_PORT == 587:
-            variants.append(('starttls', 587))
-            variants.append(('ssl', 465))
-        else:
-            variants.append(('ssl', SMTP_PORT))
-            variants.append(('starttls', SMTP_PORT))
-            if SMTP_PORT != 465:
-                variants.append(('ssl', 465))
-            if SMTP_PORT != 587:
-                variants.append(('starttls', 587))
+    return variants
 
-    last_error = None
-    for security, port in variants:
-        try:
-            local_attempts = _send_via(security, SMTP_HOST, port, msg)
+
+class SmtpMailer:
+    """A single logged-in SMTP connection shared by every message this process sends.
+
+    The connection is opened on first use with the last security/port variant that
+    worked, kept alive with NOOP while idle and closed after SMTP_IDLE_SECONDS without
+    mail. A connection the server dropped is reopened once before a send fails.
+    """
+
+    def __init__(self):
+        self._server = None
+        self._variant = None
+        self._last_activity = 0.0
+        self._last_send = 0.0
+        self._lock = threading.Lock()
+        self._metrics = {'sent': 0, 'failed': 0, 'connects': 0, 'reconnects': 0, 'noops': 0}
+
+    def send(self, msg: MIMEText) -> None:
+        with self._lock:
+            for attempt in range(2):
+                reused = self._server is not None
+                server = self._server or self._connect()
+                try:
+                    server.send_message(msg)
+                except smtplib.SMTPServerDisconnected as exc:
+                    error = exc
+                    self._drop()
+                except smtplib.SMTPException as exc:
+                    # Refusals are about this message and smtplib has already reset the session;
+                    # only 421 (server closing the session) calls for a new connection.
+                    if getattr(exc, 'smtp_code', None) != 421:
+                        self._metrics['failed'] += 1
+                        raise
+                    error = exc
+                    self._drop()
+                except OSError as exc:
+                    error = exc
+                    self._drop()
+                else:
+                    self._last_activity = self._last_send = time.monotonic()
+                    self._metrics['sent'] += 1
+                    return
+                if attempt or not reused:
+                    break
+                self._metrics['reconnects'] += 1
+            self._metrics['failed'] += 1
+            raise RuntimeError(f'SMTP соединение разорвано во время отправки: {error}') from error
+
+    def keepalive(self) -> None:
+        """NOOP an idle connection so the server does not drop it; close it once unused for long."""
+        with self._lock:
+            if self._server is None:
+                return
+            now = time.monotonic()
+            if now - self._last_send >= SMTP_IDLE_SECONDS:
+                self._drop()
+                return
+            if now - self._last_activity < SMTP_KEEPALIVE_SECONDS:
+                return
+            try:
+                code, _ = self._server.noop()
+            except Exception:
+                code = None
+            self._metrics['noops'] += 1
+            if code != 250:
+                self._drop()
+                return
+            self._last_activity = now
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._metrics,
+                'connected': self._server is not None,
+                'variant': f'{self._variant[0]}:{self._variant[1]}' if self._variant else None,
+            }
+
+    def _connect(self):
+        variants = _security_variants()
+        if self._variant in variants:
+            variants.remove(self._variant)
+            variants.insert(0, self._variant)
+        attempts = []
+        last_error = None
+        for security, port in variants:
+            try:
+                server, local_attempts = _open_via(security, SMTP_HOST, port)
+            except Exception as exc:
+                last_error = exc
+                attempts.append(f'{security}:{port}->{exc}')
+                _forget_addresses(SMTP_HOST, port)
+                continue
             attempts.extend(local_attempts)
-            return
-        except Exception as exc:
-            last_error = exc
-            attempts.append(f'{security}:{port}->{exc}')
+            self._server = server
+            self._variant = (security, port)
+            self._last_activity = self._last_send = time.monotonic()
+            self._metrics['connects'] += 1
+            return server
+        self._metrics['failed'] += 1
+        raise RuntimeError('SMTP отправка не удалась. Попытки: ' + ' | '.join(attempts)) from last_error
+
+    def _drop(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            _close(server)
+
+
+mailer = SmtpMailer()
 
-    raise RuntimeError('SMTP отправка не удалась. Попытки: ' + ' | '.join(attempts)) from last_error
+
+def send_reset_email(email: str, code: str):
+    if not smtp_configured():
+        raise RuntimeError('SMTP не настроен: проверь SMTP_USER и SMTP_PASSWORD в backend/.env')
+    mailer.send(_build_message(email, code))
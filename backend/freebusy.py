@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import heapq
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import models
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+Interval = tuple[datetime, datetime]
+
+
+def _merge_intervals(intervals: list[Interval]) -> list[Interval]:
+    if not intervals:
+        return []
+    intervals = sorted(intervals, key=lambda x: x[0])
+    merged: list[Interval] = [intervals[0]]
+    for start, end in intervals[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            if end > last_end:
+                merged[-1] = (last_start, end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def day_window(day: date, from_hour: int, to_hour: int) -> Optional[Interval]:
+    start = datetime.combine(day, time(hour=from_hour))
+    end = datetime.combine(day, datetime.min.time()) + timedelta(hours=to_hour)
+    if end <= start:
+        return None
+    return start, end
+
+
+def clip_event(ev_date: date, start_time: Optional[time], end_time: Optional[time], window: Interval) -> Optional[Interval]:
+    # Events without times block the whole window, as the best-window search always did.
+    day_start, day_end = window
+    ev_start = datetime.combine(ev_date, start_time) if start_time else day_start
+    ev_end = datetime.combine(ev_date, end_time) if end_time else day_end
+    if ev_end <= day_start or ev_start >= day_end:
+        return None
+    ev_start = max(ev_start, day_start)
+    ev_end = min(ev_end, day_end)
+    if ev_end <= ev_start:
+        return None
+    return ev_start, ev_end
+
+
+class FreeBusy:
+    """Busy time of a group's members over a date range, bucketed by day.
+
+    A member is busy during their own events in any group (personal space included)
+    and during every event of the target group itself. Only times are kept; titles
+    and descriptions never leave the loader.
+
+    Data comes from busy_index, one row of merged minute ranges per (user, day) and
+    (group, day), kept current by refresh_busy_index on every event write.
+    """
+
+    def __init__(self, member_ids: Iterable[int], start_day: date, end_day: date):
+        self.member_ids = list(dict.fromkeys(int(uid) for uid in member_ids))
+        self.start_day = start_day
+        self.end_day = end_day
+        # day -> member id -> raw (date, start_time, end_time) rows; None holds group-wide rows.
+        self._rows: dict[date, dict[Optional[int], list[tuple[date, Optional[time], Optional[time]]]]] = defaultdict(lambda: defaultdict(list))
+        # (day, window) -> busy_by_member result, so repeated searches over one horizon clip once.
+        self._busy_cache: dict[tuple[date, Interval], dict[int, list[Interval]]] = {}
+
+    @classmethod
+    def load(cls, db: Session, group_id: int, member_ids: Iterable[int], start_day: date, end_day: date) -> "FreeBusy":
+        """Read the members' and the group's rows from busy_index: O(members x days) small records."""
+        return cls.load_many(db, {group_id: member_ids}, start_day, end_day)[group_id]
+
+    @classmethod
+    def load_many(cls, db: Session, groups: dict[int, Iterable[int]], start_day: date, end_day: date) -> dict[int, "FreeBusy"]:
+        """Load several groups in one busy_index query; a member shared by groups is read once."""
+        result = {group_id: cls(member_ids, start_day, end_day) for group_id, member_ids in groups.items()}
+        user_ids = sorted({uid for fb in result.values() for uid in fb.member_ids})
+        if not user_ids:
+            return result
+        user_rows: dict[int, dict[date, list]] = defaultdict(dict)
+        group_rows: dict[int, dict[date, list]] = defaultdict(dict)
+        rows = db.execute(text(f"""
+            SELECT scope, scope_id, date, ranges
+            FROM busy_index
+            WHERE date >= :start_day AND date <= :end_day
+              AND ((scope = 'user' AND scope_id IN ({','.join(str(uid) for uid in user_ids)}))
+                   OR (scope = 'group' AND scope_id IN ({','.join(str(int(gid)) for gid in result)})))
+        """), {"start_day": start_day.isoformat(), "end_day": end_day.isoformat()}).fetchall()
+        for scope, scope_id, day_value, ranges in rows:
+            day = date.fromisoformat(str(day_value)[:10])
+            target = group_rows if scope == "group" else user_rows
+            target[scope_id][day] = [(day, start, end) for start, end in unpack_ranges(ranges)]
+        # Groups share the parsed row lists; nothing below mutates them.
+        for group_id, fb in result.items():
+            for day, items in group_rows.get(group_id, {}).items():
+                fb._rows[day][None] = items
+            for uid in fb.member_ids:
+                for day, items in user_rows.get(uid, {}).items():
+                    fb._rows[day][uid] = items
+        return result
+
+    def days(self):
+        current = self.start_day
+        while current <= self.end_day:
+            yield current
+            current += timedelta(days=1)
+
+    def busy_by_member(self, day: date, window: Interval) -> dict[int, list[Interval]]:
+        cached = self._busy_cache.get((day, window))
+        if cached is not None:
+            return cached
+        bucket = self._rows.get(day)
+        if not bucket:
+            result = {uid: [] for uid in self.member_ids}
+        else:
+            shared = [iv for iv in (clip_event(*row, window) for row in bucket.get(None, ())) if iv]
+            result = {}
+            for uid in self.member_ids:
+                own = [iv for iv in (clip_event(*row, window) for row in bucket.get(uid, ())) if iv]
+                result[uid] = _merge_intervals(shared + own)
+        self._busy_cache[(day, window)] = result
+        return result
+
+    def free_blocks(self, day: date, window: Interval, max_busy: int = 0) -> list[Interval]:
+        return free_blocks(self.busy_by_member(day, window).values(), window, max_busy)
+
+    def busy_bitmap(self, from_hour: int, to_hour: int):
+        """Minute-resolution busy bitmap shaped (days, members, minutes) for the hours window.
+
+        Clipping follows clip_event: untimed events cover the whole window. Intervals are
+        written through a difference array, so filling costs O(intervals + cells) in NumPy.
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for availability bitmaps")
+        day_list = list(self.days())
+        day_index = {d: i for i, d in enumerate(day_list)}
+        member_index = {uid: i for i, uid in enumerate(self.member_ids)}
+        window_start, window_end = from_hour * 60, to_hour * 60
+        width = max(0, window_end - window_start)
+
+        days_idx, members_idx, starts, ends = [], [], [], []
+        for ev_date, bucket in self._rows.items():
+            di = day_index.get(ev_date)
+            if di is None:
+                continue
+            for owner, rows in bucket.items():
+                mi = -1 if owner is None else member_index.get(owner)
+                if mi is None:
+                    continue
+                for _, start_time, end_time in rows:
+                    days_idx.append(di)
+                    members_idx.append(mi)
+                    starts.append(start_time.hour * 60 + start_time.minute if start_time else window_start)
+                    ends.append(end_time.hour * 60 + end_time.minute + (1 if end_time.second or end_time.microsecond else 0) if end_time else window_end)
+
+        shape = (len(day_list), len(self.member_ids), width)
+        if not days_idx or width == 0:
+            return np.zeros(shape, dtype=bool)
+        days_arr = np.asarray(days_idx, dtype=np.int64)
+        members_arr = np.asarray(members_idx, dtype=np.int64)
+        starts_arr = np.clip(np.asarray(starts, dtype=np.int64), window_start, window_end) - window_start
+        ends_arr = np.clip(np.asarray(ends, dtype=np.int64), window_start, window_end) - window_start
+        keep = ends_arr > starts_arr
+        days_arr, members_arr, starts_arr, ends_arr = days_arr[keep], members_arr[keep], starts_arr[keep], ends_arr[keep]
+
+        # Group-wide events get a member slot of their own (index M) that is OR-ed into everyone.
+        diff = np.zeros((shape[0], shape[1] + 1, width + 1), dtype=np.int32)
+        members_arr = np.where(members_arr < 0, shape[1], members_arr)
+        np.add.at(diff, (days_arr, members_arr, starts_arr), 1)
+        np.add.at(diff, (days_arr, members_arr, ends_arr), -1)
+        busy = np.cumsum(diff, axis=2)[:, :, :width] > 0
+        return busy[:, :-1, :] | busy[:, -1:, :]
+
+    def free_counts(self, from_hour: int, to_hour: int, slot_minutes: int):
+        """Number of members free for the whole of each slot, shaped (days, slots)."""
+        busy = self.busy_bitmap(from_hour, to_hour)
+        days, members, width = busy.shape
+        slots = width // slot_minutes
+        busy = busy[:, :, :slots * slot_minutes].reshape(days, members, slots, slot_minutes).any(axis=3)
+        return members - busy.sum(axis=1)
+
+
+def free_blocks(busy_lists: Iterable[list[Interval]], window: Interval, max_busy: int = 0) -> list[Interval]:
+    """Sweep over merged per-member busy lists; a moment is free while at most max_busy members are busy."""
+    points: list[tuple[datetime, int]] = []
+    for intervals in busy_lists:
+        for start, end in intervals:
+            points.append((start, 1))
+            points.append((end, -1))
+    # Ends sort before starts at the same instant so back-to-back busy blocks leave no gap.
+    points.sort(key=lambda p: (p[0], p[1]))
+    window_start, window_end = window
+    blocks: list[Interval] = []
+    busy = 0
+    free_since: Optional[datetime] = window_start
+    for moment, delta in points:
+        busy += delta
+        if busy > max_busy and free_since is not None:
+            if moment > free_since:
+                blocks.append((free_since, moment))
+            free_since = None
+        elif busy <= max_busy and free_since is None:
+            free_since = moment
+    if free_since is not None and window_end > free_since:
+        blocks.append((free_since, window_end))
+    return blocks
+
+
+def _minute_to_time(minute: int) -> Optional[time]:
+    # 24:00 is not a valid time; None already means "until the end of the window".
+    return None if minute >= 1440 else time(minute // 60, minute % 60)
+
+
+def pack_ranges(rows: Iterable[tuple[Optional[time], Optional[time]]]) -> str:
+    """Merge (start_time, end_time) rows into "start-end,..." minute ranges; missing times extend to the day edges."""
+    ranges = []
+    for start_time, end_time in rows:
+        start = start_time.hour * 60 + start_time.minute if start_time else 0
+        end = end_time.hour * 60 + end_time.minute + (1 if end_time.second or end_time.microsecond else 0) if end_time else 1440
+        if end > start:
+            ranges.append([start, end])
+    ranges.sort()
+    merged: list[list[int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return ",".join(f"{start}-{end}" for start, end in merged)
+
+
+def unpack_ranges(ranges: Optional[str]) -> list[tuple[Optional[time], Optional[time]]]:
+    result = []
+    for item in (ranges or "").split(","):
+        if not item:
+            continue
+        start, _, end = item.partition("-")
+        result.append((_minute_to_time(int(start)), _minute_to_time(int(end))))
+    return result
+
+
+def _write_busy_row(db: Session, scope: str, scope_id: int, day: date, ranges: str) -> None:
+    if ranges:
+        db.execute(text("""
+            INSERT INTO busy_index (scope, scope_id, date, ranges)
+            VALUES (:scope, :scope_id, :date, :ranges)
+            ON CONFLICT(scope, scope_id, date) DO UPDATE SET ranges=excluded.ranges
+        """), {"scope": scope, "scope_id": scope_id, "date": day.isoformat(), "ranges": ranges})
+    else:
+        db.execute(text("DELETE FROM busy_index WHERE scope=:scope AND scope_id=:scope_id AND date=:date"), {
+            "scope": scope,
+            "scope_id": scope_id,
+            "date": day.isoformat(),
+        })
+
+
+def refresh_busy_index(db: Session, user_days: Iterable[tuple[int, date]] = (), group_days: Iterable[tuple[int, date]] = ()) -> None:
+    """Recompute the busy_index rows for the given (user, day) and (group, day) keys inside the caller's transaction."""
+    db.flush()
+    for scope, column, keys in (("user", models.Event.user_id, user_days), ("group", models.Event.group_id, group_days)):
+        for scope_id, day in sorted({(int(k), d) for k, d in keys if k and d}):
+            rows = db.query(models.Event.start_time, models.Event.end_time).filter(column == scope_id, models.Event.date == day).all()
+            _write_busy_row(db, scope, scope_id, day, pack_ranges(rows))
+
+
+def rebuild_busy_index(db: Session) -> int:
+    """Regenerate busy_index from the events table; returns the number of rows written."""
+    by_key: dict[tuple[str, int, date], list[tuple[Optional[time], Optional[time]]]] = defaultdict(list)
+    rows = db.query(models.Event.user_id, models.Event.group_id, models.Event.date, models.Event.start_time, models.Event.end_time).yield_per(1000)
+    for user_id, group_id, day, start_time, end_time in rows:
+        by_key[("user", user_id, day)].append((start_time, end_time))
+        by_key[("group", group_id, day)].append((start_time, end_time))
+    db.execute(text("DELETE FROM busy_index"))
+    written = 0
+    for (scope, scope_id, day), items in by_key.items():
+        ranges = pack_ranges(items)
+        if ranges:
+            _write_busy_row(db, scope, scope_id, day, ranges)
+            written += 1
+    db.commit()
+    return written
+
+
+def union_busy(busy_lists: Iterable[list[Interval]]) -> list[Interval]:
+    merged: list[Interval] = []
+    for intervals in busy_lists:
+        merged.extend(intervals)
+    return _merge_intervals(merged)
+
+
+# Ranking weights: attendance dominates, then closeness to the preferred hour, then how soon.
+SCORE_ATTENDANCE = 10.0
+SCORE_PREFERRED_HOUR = 2.0
+SCORE_SOONER = 1.0
+
+
+def candidate_slots(
+    free_busy: FreeBusy,
+    from_hour: int,
+    to_hour: int,
+    slot_minutes: int,
+    stride_minutes: int,
+    not_before: Optional[datetime] = None,
+):
+    """Yield (start, end, free member ids, run id) for every candidate start over the horizon.
+
+    Candidates sit on a stride grid plus every moment a busy block ends, so free windows
+    that open off-grid are still found. Consecutive candidates with the same attendees
+    share a run id; the ranker keeps one slot per run to avoid near-duplicates.
+    """
+    slot_length = timedelta(minutes=slot_minutes)
+    stride = timedelta(minutes=stride_minutes)
+    run_id = 0
+    for day in free_busy.days():
+        window = day_window(day, from_hour, to_hour)
+        if window is None:
+            continue
+        window_start, window_end = window
+        busy = free_busy.busy_by_member(day, window)
+        starts = set()
+        moment = window_start
+        while moment + slot_length <= window_end:
+            starts.add(moment)
+            moment += stride
+        for intervals in busy.values():
+            starts.update(end for _, end in intervals if end + slot_length <= window_end)
+        if not_before is not None:
+            starts = {start for start in starts if start >= not_before}
+        if not starts:
+            continue
+        ordered = sorted(starts)
+
+        # Two pointers per member: candidates and busy blocks are both sorted by start.
+        free_sets: list[set[int]] = [set() for _ in ordered]
+        for uid, intervals in busy.items():
+            i = 0
+            for idx, start in enumerate(ordered):
+                while i < len(intervals) and intervals[i][1] <= start:
+                    i += 1
+                if i == len(intervals) or intervals[i][0] >= start + slot_length:
+                    free_sets[idx].add(uid)
+
+        previous = None
+        for start, free in zip(ordered, free_sets):
+            members = frozenset(free)
+            if previous is None or previous[1] != members or start > previous[0] + slot_length:
+                run_id += 1
+            previous = (start, members)
+            yield start, start + slot_length, members, run_id
+
+
+def search_slots(
+    free_busy: FreeBusy,
+    from_hour: int,
+    to_hour: int,
+    slot_minutes: int,
+    max_results: int,
+    quorum: Optional[int] = None,
+    required: Iterable[int] = (),
+    preferred_hour: Optional[int] = None,
+    stride_minutes: int = 30,
+    rank: bool = False,
+    now: Optional[datetime] = None,
+) -> list[dict]:
+    """Top-K slots where at least `quorum` members (and every required member) are free.
+
+    With rank=False the best slots are the earliest ones, matching the historical
+    chronological output; otherwise slots are scored by attendance, closeness to
+    preferred_hour and how soon they start. Accepted slots never overlap each other.
+    """
+    member_count = len(free_busy.member_ids)
+    quorum = member_count if quorum is None else max(1, min(int(quorum), member_count))
+    required = frozenset(int(uid) for uid in required)
+    horizon_start = datetime.combine(free_busy.start_day, datetime.min.time())
+    horizon = max(1.0, (free_busy.end_day - free_busy.start_day).days + 1.0)
+
+    heap = []
+    for start, end, free, run_id in candidate_slots(free_busy, from_hour, to_hour, slot_minutes, stride_minutes, now):
+        if len(free) < quorum or not required <= free:
+            continue
+        if rank:
+            score = SCORE_ATTENDANCE * len(free) / max(1, member_count)
+            if preferred_hour is not None:
+                middle = start + (end - start) / 2
+                distance = abs(middle.hour + middle.minute / 60 - preferred_hour)
+                score += SCORE_PREFERRED_HOUR * (1 - min(distance, 12) / 12)
+            score += SCORE_SOONER * (1 - (start - horizon_start).total_seconds() / 86400 / horizon)
+        else:
+            score = -(start - horizon_start).total_seconds()
+        # heapq is a min-heap: negate the score, break ties by start time.
+        heap.append((-score, start, end, run_id, free))
+    heapq.heapify(heap)
+
+    results: list[dict] = []
+    used_runs = set()
+    accepted: list[Interval] = []
+    while heap and len(results) < max_results:
+        neg_score, start, end, run_id, free = heapq.heappop(heap)
+        if run_id in used_runs or any(start < a_end and end > a_start for a_start, a_end in accepted):
+            continue
+        used_runs.add(run_id)
+        accepted.append((start, end))
+        results.append({
+            "start": start,
+            "end": end,
+            "attendance": len(free),
+            "free_member_ids": sorted(free),
+            "score": round(-neg_score, 4) if rank else None,
+        })
+    return results
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from passlib.context import CryptContext
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int((os.getenv(name) or '').strip() or default)
+    except ValueError:
+        return default
+
+
+# pbkdf2_sha256 avoids bcrypt backend issues and the 72-byte bcrypt limit. Hashes whose
+# rounds differ from PASSWORD_HASH_ROUNDS in either direction are re-hashed on login.
+PASSWORD_HASH_ROUNDS = _env_int('OPENTIME_PBKDF2_ROUNDS', 29000)
+HASH_WORKERS = _env_int('OPENTIME_HASH_WORKERS', min(2, os.cpu_count() or 1))
+HASH_QUEUE_LIMIT = _env_int('OPENTIME_HASH_QUEUE', 16)
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS,
+)
+
+
+class HashingBusy(Exception):
+    """Raised instead of queueing when HASH_QUEUE_LIMIT hashes are already in flight,
+    and when the worker pool broke and is being rebuilt."""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class HashPool:
+    """Runs password hashing in worker processes so a login burst cannot hold the GIL.
+
+    Admission counts running plus queued jobs; callers over the limit get HashingBusy
+    immediately instead of waiting. With workers=0 the hash runs in the calling thread
+    (still admission-limited), which is handy for manage.py and debugging.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = max(0, workers)
+        self.queue_limit = max(1, queue_limit)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.broken = 0
+
+    def start(self) -> Optional[ProcessPoolExecutor]:
+        # Workers come from a forkserver, never from a fork of this (threaded) process, so
+        # they cannot inherit a lock held by another thread. The warm-up job at startup
+        # launches the server and a first worker before the first login needs them.
+        with self._lock:
+            if self._executor is None and self.workers:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+                self._executor.submit(int).result()
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        # A dead worker breaks the whole executor; drop it so the next call builds a new one.
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.broken += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.queue_limit:
+                self.rejected += 1
+                raise HashingBusy()
+            self.in_flight += 1
+        try:
+            if not self.workers:
+                return fn(*args)
+            executor = self.start()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                self._discard(executor)
+                raise HashingBusy()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "queue_limit": self.queue_limit, "in_flight": self.in_flight, "rejected": self.rejected, "broken": self.broken}
+
+
+hash_pool = HashPool(HASH_WORKERS, HASH_QUEUE_LIMIT)
+
+
+def hash_password(password: str) -> str:
+    return hash_pool.run(_hash, password)
+
+
+def verify_and_update_password(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """(matches, new_hash); new_hash is set when the stored hash uses outdated parameters."""
+    return hash_pool.run(_verify_and_update, password, hashed)
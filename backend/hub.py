@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Iterable, Optional
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int((os.getenv(name) or '').strip() or default)
+    except ValueError:
+        return default
+
+
+# Put into a subscription queue instead of the messages it could not keep up with.
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """One stream connection: a bounded asyncio queue owned by the loop that created it."""
+
+    def __init__(self, user_id: int, group_ids: Iterable[int], max_queue: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = int(user_id)
+        self.group_ids = {int(gid) for gid in group_ids}
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self.dropped = 0
+
+    def offer(self, message: dict) -> None:
+        # Runs on self.loop. A slow consumer loses its backlog and is told to resync instead
+        # of letting the queue (and server memory) grow without bound.
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class ChangeHub:
+    """In-process pub/sub of committed changes, fanned out per group.
+
+    publish() is safe to call from worker threads; delivery hops onto each subscriber's
+    event loop. A broker-backed hub (Redis pub/sub, NATS) only has to provide the same
+    publish/subscribe/unsubscribe/set_user_groups methods.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._by_group: dict[int, set[Subscription]] = {}
+        self._by_user: dict[int, set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int, group_ids: Iterable[int], loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        sub = Subscription(user_id, group_ids, self.max_queue, loop or asyncio.get_running_loop())
+        with self._lock:
+            self._by_user.setdefault(sub.user_id, set()).add(sub)
+            for gid in sub.group_ids:
+                self._by_group.setdefault(gid, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._discard(self._by_user, sub.user_id, sub)
+            for gid in sub.group_ids:
+                self._discard(self._by_group, gid, sub)
+
+    def has_user(self, user_id: int) -> bool:
+        with self._lock:
+            return int(user_id) in self._by_user
+
+    def set_user_groups(self, user_id: int, group_ids: Iterable[int]) -> None:
+        """Re-target a user's open streams after they join or leave a group."""
+        group_ids = {int(gid) for gid in group_ids}
+        with self._lock:
+            for sub in self._by_user.get(int(user_id), ()):
+                for gid in sub.group_ids - group_ids:
+                    self._discard(self._by_group, gid, sub)
+                for gid in group_ids - sub.group_ids:
+                    self._by_group.setdefault(gid, set()).add(sub)
+                sub.group_ids = set(group_ids)
+
+    def publish(self, group_id: int, message: dict) -> None:
+        with self._lock:
+            targets = list(self._by_group.get(int(group_id), ()))
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, message)
+            except RuntimeError:
+                # The subscriber's loop is closed; its stream is already gone.
+                self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subs = {sub for subs in self._by_user.values() for sub in subs}
+        return {"connections": len(subs), "dropped": sum(sub.dropped for sub in subs)}
+
+    @staticmethod
+    def _discard(index: dict[int, set[Subscription]], key: int, sub: Subscription) -> None:
+        subs = index.get(key)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del index[key]
+
+
+change_hub = ChangeHub(max_queue=_env_int('OPENTIME_STREAM_QUEUE', 100))
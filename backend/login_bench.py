@@ -0,0 +1,105 @@
+"""Login throughput next to concurrent calendar reads, against a running server.
+
+    python login_bench.py --url http://127.0.0.1:8000 --user alice --password secret
+
+Runs the readers alone first, then again while --logins threads hammer /api/token, and
+prints requests/s and read latency for both phases. With the hash pool the read
+percentiles should barely move; excess logins show up as 503 instead of slow reads.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import date, timedelta
+
+
+def post_login(base, user, password):
+    body = urllib.parse.urlencode({'username': user, 'password': password}).encode()
+    req = urllib.request.Request(f'{base}/api/token', data=body, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, None
+
+
+def get(base, path, token):
+    req = urllib.request.Request(f'{base}{path}', headers={'Authorization': f'Bearer {token}'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+def run_phase(args, token, with_logins):
+    stop = threading.Event()
+    lock = threading.Lock()
+    read_latencies = []
+    login_codes = Counter()
+    today = date.today()
+    read_path = f'/api/events/range?from={today.isoformat()}&to={(today + timedelta(days=31)).isoformat()}'
+
+    def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            get(args.url, read_path, token)
+            elapsed = time.perf_counter() - started
+            with lock:
+                read_latencies.append(elapsed)
+
+    def login():
+        while not stop.is_set():
+            code, _ = post_login(args.url, args.user, args.password)
+            with lock:
+                login_codes[code] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    if with_logins:
+        threads += [threading.Thread(target=login) for _ in range(args.logins)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    read_latencies.sort()
+
+    def pct(p):
+        return read_latencies[min(len(read_latencies) - 1, int(len(read_latencies) * p))] * 1000 if read_latencies else 0.0
+
+    label = f'reads + {args.logins} login threads' if with_logins else 'reads only'
+    print(f'\n=== {label} ({args.seconds}s) ===')
+    print(f'reads:  {len(read_latencies) / args.seconds:8.1f} req/s   p50 {pct(0.5):7.1f} ms   p95 {pct(0.95):7.1f} ms   p99 {pct(0.99):7.1f} ms')
+    if with_logins:
+        ok = login_codes.get(200, 0)
+        print(f'logins: {ok / args.seconds:8.1f} ok/s    statuses {dict(login_codes)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenTime login/read benchmark')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=16)
+    parser.add_argument('--seconds', type=int, default=10)
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+
+    code, payload = post_login(args.url, args.user, args.password)
+    if code != 200:
+        raise SystemExit(f'login failed: HTTP {code}')
+    token = payload['access_token']
+    run_phase(args, token, with_logins=False)
+    run_phase(args, token, with_logins=True)
+
+
+if __name__ == '__main__':
+    main()
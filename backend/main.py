@@ -1,33 +1,40 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+import logging
 import random
 import secrets
 import os
 import threading
-
-try:
-    from pywebpush import webpush, WebPushException
-except Exception:
-    webpush = None
-    WebPushException = Exception
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date as dt_date, datetime, timedelta
 from typing import List, Optional
 from pathlib import Path
 
-from fastapi import FastAPI, Depends, HTTPException, status, Query, Body
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Body, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, event as sa_event, func, literal, literal_column, or_, text
 from sqlalchemy.orm import Session
 
 import models
 import schemas
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
-from database import engine, get_db
-from email_service import send_reset_email
+from auth import get_password_hash, verify_and_update, create_access_token, get_current_user, principal_cache, user_from_token
+from database import SessionLocal, engine, get_db
+from email_service import SMTP_KEEPALIVE_SECONDS, SMTP_TIMEOUT, mailer, send_reset_email, smtp_configured
+from cache import month_cache
+from hashing import hash_pool
+from hub import RESYNC, change_hub
+from push import PushSender
+from freebusy import FreeBusy, day_window, rebuild_busy_index, refresh_busy_index, search_slots, union_busy, np as freebusy_np
+
+logger = logging.getLogger(__name__)
 
 models.Base.metadata.create_all(bind=engine)
 
@@ -71,6 +78,8 @@ def _ensure_groups_columns() -> None:
                 conn.execute(text("ALTER TABLE groups ADD COLUMN invite_code VARCHAR"))
             if "created_at" not in names:
                 conn.execute(text("ALTER TABLE groups ADD COLUMN created_at DATETIME"))
+            if "version" not in names:
+                conn.execute(text("ALTER TABLE groups ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
             rows = conn.execute(text("SELECT id, invite_code FROM groups")).fetchall()
             for gid, code in rows:
                 if not code:
@@ -90,6 +99,8 @@ def _ensure_group_members_columns() -> None:
             names = {row[1] for row in cols}
             if "color" not in names:
                 conn.execute(text("ALTER TABLE group_members ADD COLUMN color VARCHAR"))
+            if "proposals_seen_at" not in names:
+                conn.execute(text("ALTER TABLE group_members ADD COLUMN proposals_seen_at DATETIME"))
             rows = conn.execute(text("SELECT gm.user_id, gm.group_id, gm.color, u.color FROM group_members gm LEFT JOIN users u ON u.id = gm.user_id")).fetchall()
             for user_id, group_id, color, user_color in rows:
                 if not color:
@@ -150,50 +161,508 @@ def _remove_push_subscription(user_id: int, endpoint: str) -> None:
         conn.execute(text("DELETE FROM push_subscriptions WHERE user_id=:user_id AND endpoint=:endpoint"), {"user_id": user_id, "endpoint": endpoint})
 
 
-def _send_push_to_users(user_ids: list[int], title: str, body: str, url: str = "/", tag: str = "opentime") -> None:
-    if not user_ids or not webpush or not VAPID_PUBLIC_KEY or not VAPID_PRIVATE_KEY:
+PUSH_WORKERS = int(os.getenv("OPENTIME_PUSH_WORKERS", "8") or 0)
+PUSH_TTL_SECONDS = int(os.getenv("OPENTIME_PUSH_TTL_SECONDS", "3600") or 60)
+PUSH_MAX_ATTEMPTS = 6
+PUSH_RETRY_BASE_SECONDS = 5
+PUSH_RETRY_MAX_SECONDS = 600
+PUSH_SEND_TIMEOUT_SECONDS = 10
+# A batch goes out in PUSH_CLAIM_ROUNDS rounds of one send per worker. A send can take the
+# connect plus the read timeout, so the lease covers the worst case with a margin and no
+# other process re-claims rows that are still being sent.
+PUSH_CLAIM_ROUNDS = 10
+PUSH_CLAIM_BATCH = max(1, PUSH_WORKERS) * PUSH_CLAIM_ROUNDS
+PUSH_CLAIM_LEASE_SECONDS = PUSH_CLAIM_ROUNDS * 2 * PUSH_SEND_TIMEOUT_SECONDS + 60
+PUSH_POLL_SECONDS = 5
+PUSH_COALESCE_SECONDS = int(os.getenv("OPENTIME_PUSH_COALESCE_SECONDS", "60") or 0)
+PUSH_DIGEST_PREVIEW = 3
+_push_wakeup = threading.Event()
+_push_dispatcher_stop = threading.Event()
+push_sender = PushSender(VAPID_PRIVATE_KEY, VAPID_SUBJECT, pool_size=PUSH_WORKERS)
+
+
+def _ensure_push_outbox_table() -> None:
+    # One row per (notification, subscription) so retries and stale-endpoint cleanup are
+    # per endpoint. Rows are written in the transaction of the change that caused them.
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS push_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    subscription_id INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at DATETIME NOT NULL,
+                    expires_at DATETIME NOT NULL,
+                    claimed_by VARCHAR,
+                    claimed_until DATETIME,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_push_outbox_due ON push_outbox (next_attempt_at)"))
+    except Exception:
+        pass
+
+
+def _ensure_push_digest_table() -> None:
+    # Group notifications held for the coalescing window, one row per (item, user). Every
+    # item of a (user, group) window shares the flush_at of the first one.
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS push_digest (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    group_id INTEGER NOT NULL,
+                    kind VARCHAR NOT NULL,
+                    title VARCHAR NOT NULL,
+                    body VARCHAR NOT NULL,
+                    flush_at DATETIME NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_push_digest_due ON push_digest (flush_at)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_push_digest_user_group ON push_digest (user_id, group_id, flush_at)"))
+    except Exception:
+        pass
+
+
+def _enqueue_push(db: Session, user_ids, title: str, body: str, url: str = "/", tag: str = "opentime") -> None:
+    """Queue a push for every enabled subscription of user_ids inside the caller's transaction."""
+    if not push_sender.available or not VAPID_PUBLIC_KEY:
+        return
+    unique_ids = sorted({int(uid) for uid in user_ids or [] if uid})
+    if not unique_ids:
+        return
+    if _insert_push_rows(db, unique_ids, {"title": title, "body": body, "url": url, "tag": tag}, datetime.utcnow()):
+        db.info["push_enqueued"] = True
+
+
+def _insert_push_rows(conn, user_ids, payload: dict, now: datetime) -> int:
+    return conn.execute(text(f"""
+        INSERT INTO push_outbox (subscription_id, payload, next_attempt_at, expires_at)
+        SELECT id, :payload, :now, :expires_at
+        FROM push_subscriptions
+        WHERE enabled = 1 AND user_id IN ({','.join(str(int(uid)) for uid in user_ids)})
+    """), {
+        "payload": json.dumps(payload),
+        "now": now,
+        "expires_at": now + timedelta(seconds=PUSH_TTL_SECONDS),
+    }).rowcount
+
+
+def _enqueue_group_push(db: Session, user_ids, group_id: int, kind: str, title: str, body: str) -> None:
+    """Queue a group notification ('event' or 'proposal') through the coalescing window.
+
+    Items for the same user and group within PUSH_COALESCE_SECONDS of the first one are
+    sent together when that window closes: a lone item as-is, several as one digest.
+    """
+    if PUSH_COALESCE_SECONDS <= 0:
+        _enqueue_push(db, user_ids, title, body, "/", f"opentime-{kind}")
+        return
+    if not push_sender.available or not VAPID_PUBLIC_KEY:
         return
-    unique_ids = sorted({int(uid) for uid in user_ids if uid})
+    unique_ids = sorted({int(uid) for uid in user_ids or [] if uid})
     if not unique_ids:
         return
+    now = datetime.utcnow()
+    # Only users with a subscription get a row; the open window is found through
+    # idx_push_digest_user_group, so the cost depends on pending items, not subscriptions.
+    inserted = db.execute(text(f"""
+        INSERT INTO push_digest (user_id, group_id, kind, title, body, flush_at, created_at)
+        SELECT u.id, :group_id, :kind, :title, :body,
+               COALESCE((SELECT MIN(d.flush_at) FROM push_digest d WHERE d.user_id = u.id AND d.group_id = :group_id), :flush_at),
+               :now
+        FROM users u
+        WHERE u.id IN ({','.join(str(uid) for uid in unique_ids)})
+          AND EXISTS (SELECT 1 FROM push_subscriptions s WHERE s.user_id = u.id AND s.enabled = 1)
+    """), {
+        "group_id": group_id,
+        "kind": kind,
+        "title": title,
+        "body": body,
+        "flush_at": now + timedelta(seconds=PUSH_COALESCE_SECONDS),
+        "now": now,
+    }).rowcount
+    if inserted:
+        # Wakes the dispatcher so its idle timer picks up the new window's flush_at.
+        db.info["push_enqueued"] = True
+
+
+def _ru_plural(count: int, one: str, few: str, many: str) -> str:
+    if count % 10 == 1 and count % 100 != 11:
+        return one
+    if 2 <= count % 10 <= 4 and not 12 <= count % 100 <= 14:
+        return few
+    return many
+
+
+def _push_digest_payload(group_id: int, group_name: str, items: list) -> dict:
+    tag = f"opentime-group-{group_id}"
+    if len(items) == 1:
+        return {"title": items[0].title, "body": items[0].body, "url": "/", "tag": tag}
+    events = sum(1 for item in items if item.kind == "event")
+    proposals = len(items) - events
+    if not proposals or not events:
+        count = events or proposals
+        noun = _ru_plural(count, "план", "плана", "планов") if events else _ru_plural(count, "сбор", "сбора", "сборов")
+        title = f"{count} {_ru_plural(count, 'новый', 'новых', 'новых')} {noun} в группе «{group_name}»"
+    else:
+        title = f"Новое в группе «{group_name}»: {events} {_ru_plural(events, 'план', 'плана', 'планов')} и {proposals} {_ru_plural(proposals, 'сбор', 'сбора', 'сборов')}"
+    lines = [item.body for item in items[-PUSH_DIGEST_PREVIEW:]]
+    if len(items) > PUSH_DIGEST_PREVIEW:
+        lines.append(f"и ещё {len(items) - PUSH_DIGEST_PREVIEW}")
+    return {"title": title, "body": "\n".join(lines), "url": "/", "tag": tag}
+
+
+def _flush_push_digests() -> int:
+    """Move every closed coalescing window into push_outbox; returns the number of pushes queued."""
+    now = datetime.utcnow()
+    queued = 0
     with engine.begin() as conn:
-        rows = conn.execute(text(f"SELECT id, endpoint, p256dh, auth FROM push_subscriptions WHERE enabled=1 AND user_id IN ({','.join(str(uid) for uid in unique_ids)})")).fetchall()
-    payload = json.dumps({"title": title, "body": body, "url": url, "tag": tag})
-    stale = []
-    for row in rows:
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": row[1],
-                    "keys": {"p256dh": row[2], "auth": row[3]},
-                },
-                data=payload,
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims={"sub": VAPID_SUBJECT},
-                ttl=60,
+        # DELETE ... RETURNING takes the write lock first, so two workers never flush the same rows.
+        rows = conn.execute(text("""
+            DELETE FROM push_digest WHERE flush_at <= :now
+            RETURNING id, user_id, group_id, kind, title, body
+        """), {"now": now}).fetchall()
+        if not rows:
+            return 0
+        windows: dict[tuple[int, int], list] = {}
+        for row in sorted(rows, key=lambda item: item.id):
+            windows.setdefault((row.user_id, row.group_id), []).append(row)
+        group_ids = sorted({group_id for _, group_id in windows})
+        names = dict(conn.execute(text(f"SELECT id, name FROM groups WHERE id IN ({','.join(str(int(gid)) for gid in group_ids)})")).fetchall())
+        recipients: dict[str, list[int]] = {}
+        for (user_id, group_id), items in windows.items():
+            payload = _push_digest_payload(group_id, names.get(group_id) or "OpenTime", items)
+            recipients.setdefault(json.dumps(payload, sort_keys=True), []).append(user_id)
+        for payload, user_ids in recipients.items():
+            queued += _insert_push_rows(conn, user_ids, json.loads(payload), now)
+    return queued
+
+
+def _claim_push_batch() -> tuple[str, list]:
+    # Claims are leases, so several app workers can drain the same outbox and a worker that
+    # dies mid-batch only delays its rows until the lease runs out.
+    now = datetime.utcnow()
+    token = f"{_scheduler_owner}:{secrets.token_hex(4)}"
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM push_outbox WHERE expires_at <= :now"), {"now": now})
+        conn.execute(text("""
+            UPDATE push_outbox SET claimed_by = :token, claimed_until = :until
+            WHERE id IN (
+                SELECT id FROM push_outbox
+                WHERE next_attempt_at <= :now AND (claimed_until IS NULL OR claimed_until <= :now)
+                ORDER BY next_attempt_at
+                LIMIT :limit
             )
-        except Exception as exc:
-            status_code = getattr(getattr(exc, 'response', None), 'status_code', None)
-            if status_code in (404, 410):
-                stale.append(row[0])
-    if stale:
-        with engine.begin() as conn:
-            conn.execute(text(f"DELETE FROM push_subscriptions WHERE id IN ({','.join(str(int(x)) for x in stale)})"))
+        """), {"token": token, "until": now + timedelta(seconds=PUSH_CLAIM_LEASE_SECONDS), "now": now, "limit": PUSH_CLAIM_BATCH})
+        return token, conn.execute(text("""
+            SELECT o.id, o.payload, o.attempts, o.expires_at, s.id AS subscription_id, s.endpoint, s.p256dh, s.auth
+            FROM push_outbox o
+            LEFT JOIN push_subscriptions s ON s.id = o.subscription_id AND s.enabled = 1
+            WHERE o.claimed_by = :token
+        """), {"token": token}).fetchall()
+
+
+def _deliver_push(row) -> str:
+    """Send one outbox row; returns 'sent', 'stale' (endpoint gone) or 'retry'."""
+    if row.endpoint is None:
+        return "stale"
+    expires_at = row.expires_at if isinstance(row.expires_at, datetime) else datetime.fromisoformat(str(row.expires_at))
+    try:
+        push_sender.send(
+            {"endpoint": row.endpoint, "keys": {"p256dh": row.p256dh, "auth": row.auth}},
+            row.payload,
+            ttl=max(0, int((expires_at - datetime.utcnow()).total_seconds())),
+            timeout=PUSH_SEND_TIMEOUT_SECONDS,
+        )
+        return "sent"
+    except Exception as exc:
+        status_code = getattr(getattr(exc, 'response', None), 'status_code', None)
+        if status_code in (404, 410):
+            return "stale"
+        return "retry"
 
 
+def _settle_push_batch(token: str, results: list) -> None:
+    # Every row write is guarded by the claim token: if the lease ran out and another worker
+    # took the row over, its outcome is that worker's to record.
+    done = [row.id for row, outcome in results if outcome != "retry"]
+    stale_subscriptions = sorted({row.subscription_id for row, outcome in results if outcome == "stale" and row.subscription_id})
+    with engine.begin() as conn:
+        if stale_subscriptions:
+            ids = ','.join(str(int(x)) for x in stale_subscriptions)
+            conn.execute(text(f"DELETE FROM push_subscriptions WHERE id IN ({ids})"))
+            conn.execute(text(f"DELETE FROM push_outbox WHERE subscription_id IN ({ids})"))
+        if done:
+            conn.execute(text(f"DELETE FROM push_outbox WHERE id IN ({','.join(str(int(x)) for x in done)}) AND claimed_by = :token"), {"token": token})
+        now = datetime.utcnow()
+        for row, outcome in results:
+            if outcome != "retry":
+                continue
+            attempts = (row.attempts or 0) + 1
+            if attempts >= PUSH_MAX_ATTEMPTS:
+                conn.execute(text("DELETE FROM push_outbox WHERE id = :id AND claimed_by = :token"), {"id": row.id, "token": token})
+                continue
+            delay = min(PUSH_RETRY_MAX_SECONDS, PUSH_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+            conn.execute(text("""
+                UPDATE push_outbox SET attempts = :attempts, next_attempt_at = :next_attempt_at,
+                       claimed_by = NULL, claimed_until = NULL
+                WHERE id = :id AND claimed_by = :token
+            """), {"attempts": attempts, "next_attempt_at": now + timedelta(seconds=random.uniform(delay / 2, delay)), "id": row.id, "token": token})
 
 
-def _send_push_to_users_async(user_ids: list[int], title: str, body: str, url: str = "/", tag: str = "opentime") -> None:
+def _push_idle_seconds() -> float:
+    # Sleep until the earliest retry or digest is due, but never longer than the poll interval.
     try:
-        thread = threading.Thread(
-            target=_send_push_to_users,
-            args=(list(user_ids or []), title, body, url, tag),
-            daemon=True,
-        )
-        thread.start()
+        with engine.connect() as conn:
+            due = conn.execute(text("""
+                SELECT MIN(due) FROM (
+                    SELECT MIN(MAX(next_attempt_at, COALESCE(claimed_until, next_attempt_at))) AS due FROM push_outbox
+                    UNION ALL
+                    SELECT MIN(flush_at) FROM push_digest
+                )
+            """)).scalar()
+    except Exception:
+        return PUSH_POLL_SECONDS
+    if due is None:
+        return PUSH_POLL_SECONDS
+    due = due if isinstance(due, datetime) else datetime.fromisoformat(str(due))
+    return min(PUSH_POLL_SECONDS, max(0.05, (due - datetime.utcnow()).total_seconds()))
+
+
+def _push_dispatcher_loop(workers: int) -> None:
+    # A fixed pool sends one claimed batch concurrently; commits that queue pushes wake the
+    # loop right away, otherwise it polls for retries that became due.
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="push") as pool:
+        while not _push_dispatcher_stop.is_set():
+            try:
+                _flush_push_digests()
+                token, batch = _claim_push_batch()
+                if batch:
+                    _settle_push_batch(token, list(zip(batch, pool.map(_deliver_push, batch))))
+                    continue
+            except Exception:
+                logger.exception("Push dispatcher failed")
+            _push_wakeup.wait(_push_idle_seconds())
+            _push_wakeup.clear()
+
+
+def _start_push_dispatcher() -> None:
+    if not push_sender.available or PUSH_WORKERS <= 0:
+        return
+    _push_dispatcher_stop.clear()
+    threading.Thread(target=_push_dispatcher_loop, args=(PUSH_WORKERS,), daemon=True).start()
+
+
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BASE_SECONDS = 10
+# Rows are claimed one at a time. The lease covers the slowest single send: a new connection
+# that walks every security/port variant, each taking up to five SMTP round trips
+# (connect, EHLO, STARTTLS, login, DATA) at SMTP_TIMEOUT.
+EMAIL_CLAIM_LEASE_SECONDS = 4 * 5 * SMTP_TIMEOUT + 60
+_email_wakeup = threading.Event()
+_email_outbox_stop = threading.Event()
+
+
+def _ensure_email_outbox_table() -> None:
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS email_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    kind VARCHAR NOT NULL,
+                    recipient VARCHAR NOT NULL,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    next_attempt_at DATETIME NOT NULL,
+                    expires_at DATETIME NOT NULL,
+                    claimed_by VARCHAR,
+                    claimed_until DATETIME,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (next_attempt_at)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_email_outbox_user ON email_outbox (user_id, kind)"))
     except Exception:
         pass
 
+
+def _enqueue_reset_email(db: Session, user: models.User) -> None:
+    """Queue the reset code mail in the caller's transaction, replacing any unsent older code."""
+    db.execute(text("DELETE FROM email_outbox WHERE user_id = :user_id AND kind = 'password_reset'"), {"user_id": user.id})
+    db.execute(text("""
+        INSERT INTO email_outbox (user_id, kind, recipient, payload, next_attempt_at, expires_at)
+        VALUES (:user_id, 'password_reset', :recipient, :payload, :now, :expires_at)
+    """), {
+        "user_id": user.id,
+        "recipient": user.email,
+        "payload": json.dumps({"code": user.reset_token}),
+        "now": datetime.utcnow(),
+        "expires_at": user.reset_token_expires_at,
+    })
+    db.info["email_enqueued"] = True
+
+
+def _claim_email() -> tuple:
+    now = datetime.utcnow()
+    token = f"{_scheduler_owner}:{secrets.token_hex(4)}"
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM email_outbox WHERE expires_at <= :now"), {"now": now})
+        conn.execute(text("""
+            UPDATE email_outbox SET claimed_by = :token, claimed_until = :until
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE next_attempt_at <= :now AND (claimed_until IS NULL OR claimed_until <= :now)
+                ORDER BY next_attempt_at
+                LIMIT 1
+            )
+        """), {"token": token, "until": now + timedelta(seconds=EMAIL_CLAIM_LEASE_SECONDS), "now": now})
+        return token, conn.execute(text("""
+            SELECT id, user_id, kind, recipient, payload, attempts FROM email_outbox
+            WHERE claimed_by = :token
+        """), {"token": token}).first()
+
+
+def _deliver_email(token: str, row) -> None:
+    # Writes require the claim token, so a worker whose lease ran out cannot touch a row that
+    # another worker has claimed since.
+    payload = json.loads(row.payload)
+    try:
+        send_reset_email(row.recipient, payload["code"])
+    except Exception as exc:
+        attempts = (row.attempts or 0) + 1
+        # SMTP refusals quote the address back; keep it out of the logs.
+        error = str(exc).replace(row.recipient, "<recipient>")
+        with engine.begin() as conn:
+            if attempts >= EMAIL_MAX_ATTEMPTS:
+                logger.error("Email outbox row %s (user %s) dropped after %s attempts: %s", row.id, row.user_id, attempts, error)
+                conn.execute(text("DELETE FROM email_outbox WHERE id = :id AND claimed_by = :token"), {"id": row.id, "token": token})
+                return
+            logger.warning("Email outbox row %s (user %s) failed, attempt %s: %s", row.id, row.user_id, attempts, error)
+            delay = EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            conn.execute(text("""
+                UPDATE email_outbox SET attempts = :attempts, last_error = :error, next_attempt_at = :next_attempt_at,
+                       claimed_by = NULL, claimed_until = NULL
+                WHERE id = :id AND claimed_by = :token
+            """), {"attempts": attempts, "error": str(exc)[:1000], "next_attempt_at": datetime.utcnow() + timedelta(seconds=random.uniform(delay / 2, delay)), "id": row.id, "token": token})
+        return
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM email_outbox WHERE id = :id AND claimed_by = :token"), {"id": row.id, "token": token})
+
+
+def _email_idle_seconds() -> float:
+    try:
+        with engine.connect() as conn:
+            due = conn.execute(text("SELECT MIN(MAX(next_attempt_at, COALESCE(claimed_until, next_attempt_at))) FROM email_outbox")).scalar()
+    except Exception:
+        return SMTP_KEEPALIVE_SECONDS
+    if due is None:
+        return SMTP_KEEPALIVE_SECONDS
+    due = due if isinstance(due, datetime) else datetime.fromisoformat(str(due))
+    return min(SMTP_KEEPALIVE_SECONDS, max(0.05, (due - datetime.utcnow()).total_seconds()))
+
+
+def _email_outbox_loop() -> None:
+    # One thread and one SMTP session: mails go out sequentially over the warm connection,
+    # and between them the loop doubles as the NOOP keepalive timer.
+    while not _email_outbox_stop.is_set():
+        try:
+            token, row = _claim_email()
+            if row is not None:
+                _deliver_email(token, row)
+                continue
+            mailer.keepalive()
+        except Exception:
+            logger.exception("Email outbox failed")
+        _email_wakeup.wait(_email_idle_seconds())
+        _email_wakeup.clear()
+    mailer.close()
+
+
+def _email_outbox_depth() -> dict:
+    try:
+        with engine.connect() as conn:
+            queued, retrying = conn.execute(text("SELECT COUNT(*), COUNT(*) FILTER (WHERE attempts > 0) FROM email_outbox")).one()
+    except Exception:
+        return {"queued": None, "retrying": None}
+    return {"queued": queued, "retrying": retrying or 0}
+
+
+def _start_email_outbox() -> None:
+    _email_outbox_stop.clear()
+    threading.Thread(target=_email_outbox_loop, daemon=True).start()
+
+
+# Materialized vote summary on meeting_proposals. Only current group members count, and
+# members without a recorded vote are "pending", so both votes and membership changes
+# have to recompute these (see _recompute_proposal_tallies).
+PROPOSAL_TALLY_COLUMNS = ("votes_yes", "votes_no", "votes_maybe", "votes_pending")
+
+_PROPOSAL_TALLY_SQL = {
+    "votes_yes": """
+        SELECT COUNT(*) FROM group_members gm
+        JOIN meeting_proposal_votes v ON v.proposal_id = meeting_proposals.id AND v.user_id = gm.user_id
+        WHERE gm.group_id = meeting_proposals.group_id AND v.vote = 'yes'
+    """,
+    "votes_no": """
+        SELECT COUNT(*) FROM group_members gm
+        JOIN meeting_proposal_votes v ON v.proposal_id = meeting_proposals.id AND v.user_id = gm.user_id
+        WHERE gm.group_id = meeting_proposals.group_id AND v.vote = 'no'
+    """,
+    "votes_maybe": """
+        SELECT COUNT(*) FROM group_members gm
+        JOIN meeting_proposal_votes v ON v.proposal_id = meeting_proposals.id AND v.user_id = gm.user_id
+        WHERE gm.group_id = meeting_proposals.group_id AND v.vote = 'maybe'
+    """,
+    "votes_pending": """
+        SELECT COUNT(*) FROM group_members gm
+        LEFT JOIN meeting_proposal_votes v ON v.proposal_id = meeting_proposals.id AND v.user_id = gm.user_id
+        WHERE gm.group_id = meeting_proposals.group_id
+          AND (v.vote IS NULL OR v.vote NOT IN ('yes', 'no', 'maybe'))
+    """,
+}
+
+_PROPOSAL_TALLY_ASSIGNMENTS = ", ".join(f"{col} = ({sql})" for col, sql in _PROPOSAL_TALLY_SQL.items())
+
+
+def _rebuild_meeting_proposals_status_not_null(conn) -> None:
+    # SQLite cannot ALTER a column to NOT NULL, so older databases get the table rebuilt
+    # once with NULL statuses normalized to 'open'.
+    cols = conn.execute(text("PRAGMA table_info(meeting_proposals)")).fetchall()
+    status_col = next((row for row in cols if row[1] == "status"), None)
+    if status_col is None or status_col[3]:
+        return
+    definitions = []
+    for _, name, col_type, notnull, default, pk in cols:
+        if pk:
+            definitions.append(f"{name} INTEGER PRIMARY KEY AUTOINCREMENT")
+        elif name == "status":
+            definitions.append("status VARCHAR NOT NULL DEFAULT 'open'")
+        else:
+            definition = f"{name} {col_type}"
+            if notnull:
+                definition += " NOT NULL"
+            if default is not None:
+                definition += f" DEFAULT {default}"
+            definitions.append(definition)
+    names = ", ".join(row[1] for row in cols)
+    selected = ", ".join("COALESCE(status, 'open')" if row[1] == "status" else row[1] for row in cols)
+    seq = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'meeting_proposals'")).scalar()
+    # The events triggers reference meeting_proposals; _ensure_meeting_proposal_triggers recreates them.
+    conn.execute(text("DROP TRIGGER IF EXISTS trg_events_delete_proposal"))
+    conn.execute(text("DROP TRIGGER IF EXISTS trg_events_detach_proposal"))
+    conn.execute(text(f"CREATE TABLE meeting_proposals_rebuild ({', '.join(definitions)})"))
+    conn.execute(text(f"INSERT INTO meeting_proposals_rebuild ({names}) SELECT {selected} FROM meeting_proposals"))
+    conn.execute(text("DROP TABLE meeting_proposals"))
+    conn.execute(text("ALTER TABLE meeting_proposals_rebuild RENAME TO meeting_proposals"))
+    if seq:
+        conn.execute(text("UPDATE sqlite_sequence SET seq = MAX(seq, :seq) WHERE name = 'meeting_proposals'"), {"seq": seq})
+
+
 def _ensure_meeting_proposal_tables() -> None:
     try:
         with engine.begin() as conn:
@@ -207,11 +676,12 @@ def _ensure_meeting_proposal_tables() -> None:
                     date DATE NOT NULL,
                     start_time TIME NOT NULL,
                     end_time TIME NOT NULL,
-                    status VARCHAR DEFAULT 'open',
+                    status VARCHAR NOT NULL DEFAULT 'open',
                     shadow_event_id INTEGER,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """))
+            _rebuild_meeting_proposals_status_not_null(conn)
             conn.execute(text("""
                 CREATE TABLE IF NOT EXISTS meeting_proposal_votes (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -226,18 +696,395 @@ def _ensure_meeting_proposal_tables() -> None:
             names = {row[1] for row in rows}
             if "idx_meeting_proposal_votes_unique" not in names:
                 conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_meeting_proposal_votes_unique ON meeting_proposal_votes (proposal_id, user_id)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_meeting_proposals_shadow_event ON meeting_proposals (shadow_event_id)"))
+            # Serves the group proposal list: equality on group_id/status, then the keyset order.
+            conn.execute(text("DROP INDEX IF EXISTS idx_meeting_proposals_group"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_meeting_proposals_group_status_date ON meeting_proposals (group_id, status, date, start_time, id)"))
+            # status=closed/all: the same keyset order without status, which is then a residual filter.
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_meeting_proposals_group_date ON meeting_proposals (group_id, date, start_time, id)"))
+            cols = conn.execute(text("PRAGMA table_info(meeting_proposals)")).fetchall()
+            names = {row[1] for row in cols}
+            if "closed_at" not in names:
+                conn.execute(text("ALTER TABLE meeting_proposals ADD COLUMN closed_at DATETIME"))
+            missing = [col for col in PROPOSAL_TALLY_COLUMNS if col not in names]
+            for col in missing:
+                conn.execute(text(f"ALTER TABLE meeting_proposals ADD COLUMN {col} INTEGER NOT NULL DEFAULT 0"))
+            if missing:
+                conn.execute(text(f"UPDATE meeting_proposals SET {_PROPOSAL_TALLY_ASSIGNMENTS}"))
+    except Exception:
+        pass
+
+
+def _ensure_events_columns() -> None:
+    try:
+        with engine.begin() as conn:
+            cols = conn.execute(text("PRAGMA table_info(events)")).fetchall()
+            names = {row[1] for row in cols}
+            if "updated_at" not in names:
+                conn.execute(text("ALTER TABLE events ADD COLUMN updated_at DATETIME"))
+                conn.execute(text("UPDATE events SET updated_at = created_at"))
+            if "version" not in names:
+                conn.execute(text("ALTER TABLE events ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+            if "proposal_id" not in names:
+                conn.execute(text("ALTER TABLE events ADD COLUMN proposal_id INTEGER"))
+            if "kind" not in names:
+                conn.execute(text("ALTER TABLE events ADD COLUMN kind VARCHAR NOT NULL DEFAULT 'regular'"))
+                # One-off backfill from the title prefixes and [proposal:N] shadow markers the
+                # kind replaces; __PROPOSAL__ descriptions are handled with their votes.
+                conn.execute(text("""
+                    UPDATE events SET kind = 'legacy_proposal'
+                    WHERE title LIKE 'ВСТРЕЧА ·%' OR title LIKE '📌 %'
+                """))
+                shadow_of = """
+                    FROM meeting_proposals mp
+                    WHERE mp.shadow_event_id = events.id
+                      AND mp.status = 'open'
+                      AND events.description LIKE ('[proposal:' || mp.id || ']%')
+                """
+                conn.execute(text(f"""
+                    UPDATE events SET kind = 'proposal_shadow', proposal_id = (SELECT mp.id {shadow_of} LIMIT 1)
+                    WHERE EXISTS (SELECT 1 {shadow_of})
+                """))
     except Exception:
         pass
 
 
-def _cleanup_orphan_meeting_proposals(db: Session) -> None:
+def _ensure_events_indexes() -> None:
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_events_group_date_start ON events (group_id, date, start_time)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_events_user_date ON events (user_id, date)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_events_group_kind_date ON events (group_id, kind, date)"))
+    except Exception:
+        pass
+
+
+def _ensure_event_proposal_votes_table() -> None:
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS event_proposal_votes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    vote VARCHAR NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_event_proposal_votes_unique ON event_proposal_votes (event_id, user_id)"))
+            conn.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS trg_events_delete_votes
+                AFTER DELETE ON events
+                BEGIN
+                    DELETE FROM event_proposal_votes WHERE event_id = OLD.id;
+                END
+            """))
+            # Legacy rows keep votes as JSON behind the marker: move them out once and keep only
+            # the visible text; the event kind records that it is a proposal.
+            rows = conn.execute(text("""
+                SELECT id, description FROM events
+                WHERE substr(description, 1, :prefix_len) = :prefix
+            """), {"prefix": PROPOSAL_META_PREFIX, "prefix_len": len(PROPOSAL_META_PREFIX)}).fetchall()
+            for event_id, description in rows:
+                meta, visible = _extract_proposal_meta(description)
+                for vote in ("yes", "no"):
+                    for user_id in meta.get(f"votes_{vote}", []):
+                        conn.execute(text("""
+                            INSERT INTO event_proposal_votes (event_id, user_id, vote)
+                            VALUES (:event_id, :user_id, :vote)
+                            ON CONFLICT(event_id, user_id) DO NOTHING
+                        """), {"event_id": event_id, "user_id": int(user_id), "vote": vote})
+                conn.execute(text("UPDATE events SET description=:description, kind=:kind WHERE id=:event_id"), {
+                    "description": visible.strip() or None,
+                    "kind": EVENT_KIND_LEGACY_PROPOSAL,
+                    "event_id": event_id,
+                })
+    except Exception:
+        logger.exception("event_proposal_votes migration failed")
+
+
+def _ensure_busy_index_table() -> None:
+    try:
+        with engine.begin() as conn:
+            existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='busy_index'")).fetchone()
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS busy_index (
+                    scope VARCHAR NOT NULL,
+                    scope_id INTEGER NOT NULL,
+                    date DATE NOT NULL,
+                    ranges TEXT NOT NULL,
+                    PRIMARY KEY (scope, scope_id, date)
+                )
+            """))
+        if not existed:
+            db = SessionLocal()
+            try:
+                rebuild_busy_index(db)
+            finally:
+                db.close()
+    except Exception:
+        pass
+
+
+def _event_busy_key(ev) -> tuple[int, int, dt_date]:
+    return ev.user_id, ev.group_id, ev.date
+
+
+def _refresh_event_busy(db: Session, *keys) -> None:
+    # keys are (user_id, group_id, date) snapshots taken before and/or after the write.
+    keys = [key for key in keys if key]
+    refresh_busy_index(db, [(user_id, day) for user_id, _, day in keys], [(group_id, day) for _, group_id, day in keys])
+
+
+def _group_busy_keys(db: Session, group_id: int) -> list[tuple[int, int, dt_date]]:
+    return [tuple(row) for row in db.query(models.Event.user_id, models.Event.group_id, models.Event.date).filter(models.Event.group_id == group_id).distinct().all()]
+
+
+def _ensure_change_log_table() -> None:
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS change_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    group_id INTEGER NOT NULL,
+                    entity VARCHAR NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    op VARCHAR NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_change_log_group_id ON change_log (group_id, id)"))
+    except Exception:
+        pass
+
+
+def _ensure_scheduler_leases_table() -> None:
+    # One row per periodic job: whichever worker holds the lease runs it, and next_run_at
+    # survives restarts so a redeploy does not trigger an extra pass.
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS scheduler_leases (
+                    name VARCHAR PRIMARY KEY,
+                    owner VARCHAR,
+                    lease_until DATETIME,
+                    next_run_at DATETIME
+                )
+            """))
+    except Exception:
+        pass
+
+
+_OPEN_SHADOW_PROPOSALS = "SELECT id FROM meeting_proposals WHERE shadow_event_id = {event} AND status = 'open'{extra}"
+
+
+def _ensure_meeting_proposal_triggers() -> None:
+    # Deleting a shadow event, or turning it into something other than this proposal's shadow,
+    # closes the proposal in the same statement. Reads never have to clean up after it.
+    detached = " AND (NEW.kind != 'proposal_shadow' OR NEW.proposal_id IS NOT id)"
+    triggers = {
+        "trg_events_delete_proposal": ("AFTER DELETE ON events", "", _OPEN_SHADOW_PROPOSALS.format(event="OLD.id", extra="")),
+        "trg_events_detach_proposal": (
+            "AFTER UPDATE OF kind, proposal_id ON events",
+            f"WHEN EXISTS ({_OPEN_SHADOW_PROPOSALS.format(event='NEW.id', extra=detached)})",
+            _OPEN_SHADOW_PROPOSALS.format(event="NEW.id", extra=detached),
+        ),
+    }
+    try:
+        with engine.begin() as conn:
+            for name, (timing, condition, proposals) in triggers.items():
+                # Recreated on every start so changed definitions replace the old ones.
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"""
+                    CREATE TRIGGER {name}
+                    {timing}
+                    {condition}
+                    BEGIN
+                        INSERT INTO change_log (group_id, entity, entity_id, op)
+                            SELECT group_id, 'proposal', id, 'delete' FROM meeting_proposals WHERE id IN ({proposals});
+                        UPDATE groups SET version = COALESCE(version, 0) + 1
+                            WHERE id IN (SELECT group_id FROM meeting_proposals WHERE id IN ({proposals}));
+                        DELETE FROM meeting_proposal_votes WHERE proposal_id IN ({proposals});
+                        DELETE FROM meeting_proposals WHERE id IN ({proposals});
+                    END
+                """))
+    except Exception:
+        logger.exception("Proposal triggers not created")
+
+
+def _record_change(db: Session, group_id: int, entity: str, entity_id: int, op: str = "upsert", action: Optional[str] = None) -> None:
+    # Written inside the caller's transaction; the autoincrement id is the sync cursor and
+    # rows with op='delete' are the tombstones clients use to drop cached items.
+    row = db.execute(text("""
+        INSERT INTO change_log (group_id, entity, entity_id, op)
+        VALUES (:group_id, :entity, :entity_id, :op)
+    """), {"group_id": group_id, "entity": entity, "entity_id": entity_id, "op": op})
+    _bump_group_versions(db, [group_id])
+    # Streamed to /api/stream subscribers once the transaction commits.
+    db.info.setdefault("pending_changes", []).append({
+        "id": row.lastrowid,
+        "group_id": group_id,
+        "entity": entity,
+        "entity_id": entity_id,
+        "op": op,
+        "action": action or ("deleted" if op == "delete" else "updated"),
+    })
+
+
+@sa_event.listens_for(SessionLocal, "after_commit")
+def _publish_committed_changes(session) -> None:
+    for change in session.info.pop("pending_changes", []):
+        change_hub.publish(change["group_id"], change)
+    if session.info.pop("push_enqueued", False):
+        _push_wakeup.set()
+    if session.info.pop("email_enqueued", False):
+        _email_wakeup.set()
+
+
+@sa_event.listens_for(SessionLocal, "after_rollback")
+def _drop_rolled_back_changes(session) -> None:
+    session.info.pop("pending_changes", None)
+    session.info.pop("push_enqueued", None)
+    session.info.pop("email_enqueued", None)
+
+
+def _bump_group_versions(db: Session, group_ids) -> None:
+    ids = sorted({int(gid) for gid in group_ids or [] if gid})
+    if ids:
+        db.execute(text(f"UPDATE groups SET version = COALESCE(version, 0) + 1 WHERE id IN ({','.join(str(gid) for gid in ids)})"))
+
+
+def _bump_user_group_versions(db: Session, user_id: int) -> None:
+    # Profile fields (name, avatar, color) are embedded in every group payload the user appears in.
+    db.execute(text("""
+        UPDATE groups SET version = COALESCE(version, 0) + 1
+        WHERE id IN (SELECT group_id FROM group_members WHERE user_id = :user_id)
+    """), {"user_id": user_id})
+
+
+def _group_versions(db: Session, user_id: int, group_id: Optional[int] = None) -> list[tuple[int, int]]:
+    sql = """
+        SELECT g.id, COALESCE(g.version, 0)
+        FROM groups g
+        JOIN group_members gm ON gm.group_id = g.id AND gm.user_id = :user_id
+    """
+    params = {"user_id": user_id}
+    if group_id is not None:
+        sql += " WHERE g.id = :group_id"
+        params["group_id"] = group_id
+    return [(row[0], row[1]) for row in db.execute(text(sql + " ORDER BY g.id"), params).fetchall()]
+
+
+def _weak_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    header = request.headers.get("if-none-match") or ""
+    candidates = {item.strip().removeprefix("W/") for item in header.split(",") if item.strip()}
+    if "*" in candidates or etag.removeprefix("W/") in candidates:
+        return Response(status_code=304, headers=_etag_headers(etag))
+    return None
+
+
+def _etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def _set_etag(response: Response, etag: str) -> None:
+    response.headers.update(_etag_headers(etag))
+
+
+def _user_group_ids(db: Session, user_id: int) -> list[int]:
+    return [row[0] for row in db.query(models.GroupMember.group_id).filter(models.GroupMember.user_id == user_id).all()]
+
+
+def _retarget_streams(db: Session, user_ids) -> None:
+    # Called after membership commits so open /api/stream connections follow the change.
+    for user_id in set(user_ids):
+        if change_hub.has_user(user_id):
+            change_hub.set_user_groups(user_id, _user_group_ids(db, user_id))
+
+
+def _recompute_proposal_tallies(db: Session, proposal_ids=None, group_id: Optional[int] = None) -> None:
+    """Refresh the materialized vote columns inside the caller's transaction.
+
+    Pass the proposal a vote touched, or the group whose roster changed (its open
+    proposals are recomputed); with neither, every proposal is recomputed.
+    """
+    if proposal_ids is not None:
+        ids = ','.join(str(int(pid)) for pid in proposal_ids)
+        if not ids:
+            return
+        db.execute(text(f"UPDATE meeting_proposals SET {_PROPOSAL_TALLY_ASSIGNMENTS} WHERE id IN ({ids})"))
+    elif group_id is not None:
+        db.execute(text(f"""
+            UPDATE meeting_proposals SET {_PROPOSAL_TALLY_ASSIGNMENTS}
+            WHERE group_id = :group_id AND status = 'open'
+        """), {"group_id": group_id})
+    else:
+        db.execute(text(f"UPDATE meeting_proposals SET {_PROPOSAL_TALLY_ASSIGNMENTS}"))
+
+
+def _proposal_tally_drift(db: Session) -> list[dict]:
+    """Proposals whose stored tallies differ from a recount of votes and membership."""
+    recount = ", ".join(f"({sql}) AS actual_{col}" for col, sql in _PROPOSAL_TALLY_SQL.items())
+    rows = db.execute(text(f"""
+        SELECT id, group_id, {', '.join(PROPOSAL_TALLY_COLUMNS)}, {recount}
+        FROM meeting_proposals
+    """)).mappings().all()
+    drift = []
+    for row in rows:
+        stored = {col: row[col] for col in PROPOSAL_TALLY_COLUMNS}
+        actual = {col: row[f"actual_{col}"] for col in PROPOSAL_TALLY_COLUMNS}
+        if stored != actual:
+            drift.append({"proposal_id": row["id"], "group_id": row["group_id"], "stored": stored, "actual": actual})
+    return drift
+
+
+def _sweep_orphan_meeting_proposals(db: Session) -> int:
+    """Drop open proposals whose shadow event is gone or no longer carries their marker.
+
+    The events triggers keep new data consistent at write time; this pass only mops up
+    rows written before they existed. Returns the number of proposals removed.
+    """
+    orphan_count = db.execute(text("""
+        SELECT COUNT(*)
+        FROM meeting_proposals mp
+        LEFT JOIN events e ON e.id = mp.shadow_event_id
+        WHERE mp.status = 'open'
+          AND mp.shadow_event_id IS NOT NULL
+          AND e.id IS NULL
+    """)).scalar() or 0
+    db.execute(text("""
+        INSERT INTO change_log (group_id, entity, entity_id, op)
+        SELECT mp.group_id, 'proposal', mp.id, 'delete'
+        FROM meeting_proposals mp
+        LEFT JOIN events e ON e.id = mp.shadow_event_id
+        WHERE mp.status = 'open'
+          AND mp.shadow_event_id IS NOT NULL
+          AND e.id IS NULL
+    """))
+    db.execute(text("""
+        UPDATE groups SET version = COALESCE(version, 0) + 1
+        WHERE id IN (
+            SELECT mp.group_id
+            FROM meeting_proposals mp
+            LEFT JOIN events e ON e.id = mp.shadow_event_id
+            WHERE mp.status = 'open'
+              AND mp.shadow_event_id IS NOT NULL
+              AND e.id IS NULL
+        )
+    """))
     db.execute(text("""
         DELETE FROM meeting_proposal_votes
         WHERE proposal_id IN (
             SELECT mp.id
             FROM meeting_proposals mp
             LEFT JOIN events e ON e.id = mp.shadow_event_id
-            WHERE COALESCE(mp.status, 'open') = 'open'
+            WHERE mp.status = 'open'
               AND mp.shadow_event_id IS NOT NULL
               AND e.id IS NULL
         )
@@ -248,24 +1095,204 @@ def _cleanup_orphan_meeting_proposals(db: Session) -> None:
             SELECT mp.id
             FROM meeting_proposals mp
             LEFT JOIN events e ON e.id = mp.shadow_event_id
-            WHERE COALESCE(mp.status, 'open') = 'open'
+            WHERE mp.status = 'open'
               AND mp.shadow_event_id IS NOT NULL
               AND e.id IS NULL
         )
     """))
     # Also drop stale proposals whose shadow event exists but no longer points back to this proposal.
-    stale_ids = [row[0] for row in db.execute(text("""
-        SELECT mp.id
+    stale_rows = db.execute(text("""
+        SELECT mp.id, mp.group_id, e.date
         FROM meeting_proposals mp
         JOIN events e ON e.id = mp.shadow_event_id
-        WHERE COALESCE(mp.status, 'open') = 'open'
+        WHERE mp.status = 'open'
           AND mp.shadow_event_id IS NOT NULL
-          AND (e.description IS NULL OR e.description NOT LIKE ('[proposal:' || mp.id || ']%'))
-    """)).fetchall()]
+          AND (e.kind != :shadow OR e.proposal_id IS NOT mp.id)
+    """), {"shadow": EVENT_KIND_PROPOSAL_SHADOW}).fetchall()
+    stale_ids = [row[0] for row in stale_rows]
+    for stale_id, stale_group_id, _ in stale_rows:
+        _record_change(db, stale_group_id, "proposal", stale_id, "delete")
     if stale_ids:
         db.execute(text(f"DELETE FROM meeting_proposal_votes WHERE proposal_id IN ({','.join(str(int(x)) for x in stale_ids)})"))
         db.execute(text(f"DELETE FROM meeting_proposals WHERE id IN ({','.join(str(int(x)) for x in stale_ids)})"))
+        db.execute(text(f"""
+            UPDATE events SET kind = :regular, proposal_id = NULL
+            WHERE kind = :shadow AND proposal_id IN ({','.join(str(int(x)) for x in stale_ids)})
+        """), {"regular": EVENT_KIND_REGULAR, "shadow": EVENT_KIND_PROPOSAL_SHADOW})
     db.commit()
+    # The shadow events of dropped proposals are no longer excluded from the month feed.
+    for _, stale_group_id, shadow_date in stale_rows:
+        if shadow_date:
+            month_cache.invalidate_dates(stale_group_id, dt_date.fromisoformat(str(shadow_date)[:10]))
+    return orphan_count + len(stale_rows)
+
+
+PROPOSAL_SWEEP_INTERVAL_SECONDS = int(os.getenv("OPENTIME_PROPOSAL_SWEEP_SECONDS", "3600") or 0)
+_proposal_sweeper_stop = threading.Event()
+
+
+def _proposal_sweeper_loop(interval: int) -> None:
+    while True:
+        db = SessionLocal()
+        try:
+            removed = _sweep_orphan_meeting_proposals(db)
+            if removed:
+                logger.info("Proposal sweeper removed %s orphan proposals", removed)
+        except Exception:
+            db.rollback()
+            logger.exception("Proposal sweeper failed")
+        finally:
+            db.close()
+        if interval <= 0 or _proposal_sweeper_stop.wait(interval):
+            return
+
+
+def _start_proposal_sweeper() -> None:
+    # One pass at startup covers legacy rows; later passes only matter if triggers were bypassed.
+    _proposal_sweeper_stop.clear()
+    threading.Thread(target=_proposal_sweeper_loop, args=(PROPOSAL_SWEEP_INTERVAL_SECONDS,), daemon=True).start()
+
+
+PROPOSAL_FINALIZE_INTERVAL_SECONDS = int(os.getenv("OPENTIME_PROPOSAL_FINALIZE_SECONDS", "300") or 0)
+PROPOSAL_FINALIZE_BATCH = 200
+PROPOSAL_FINALIZER_LEASE = "proposal-finalizer"
+_proposal_finalizer_stop = threading.Event()
+_scheduler_owner = f"{os.getpid()}:{secrets.token_hex(4)}"
+
+
+def _acquire_scheduler_lease(name: str, lease_seconds: int) -> bool:
+    """Take the named job if it is due and nobody else holds a live lease on it."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT OR IGNORE INTO scheduler_leases (name) VALUES (:name)"), {"name": name})
+        taken = conn.execute(text("""
+            UPDATE scheduler_leases SET owner = :owner, lease_until = :lease_until
+            WHERE name = :name
+              AND (next_run_at IS NULL OR next_run_at <= :now)
+              AND (lease_until IS NULL OR lease_until <= :now OR owner = :owner)
+        """), {"name": name, "owner": _scheduler_owner, "lease_until": now + timedelta(seconds=lease_seconds), "now": now}).rowcount
+    return taken == 1
+
+
+def _release_scheduler_lease(name: str, next_run_in: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE scheduler_leases SET lease_until = NULL, next_run_at = :next_run_at
+            WHERE name = :name AND owner = :owner
+        """), {"name": name, "owner": _scheduler_owner, "next_run_at": datetime.utcnow() + timedelta(seconds=next_run_in)})
+
+
+PROPOSAL_OUTCOME_TITLES = {
+    "accepted": "Встреча состоится",
+    "rejected": "Встреча не состоится",
+    "expired": "Сбор закрыт без решения",
+}
+
+
+def _proposal_outcome(row) -> str:
+    # Accepted once a strict majority of the current members said yes; otherwise the
+    # proposal is rejected when everyone has answered, or expires when its start passes.
+    members = (row.votes_yes or 0) + (row.votes_no or 0) + (row.votes_maybe or 0) + (row.votes_pending or 0)
+    if members and (row.votes_yes or 0) * 2 > members:
+        return "accepted"
+    if not row.votes_pending:
+        return "rejected"
+    return "expired"
+
+
+def _finalize_meeting_proposals(db: Session, now: Optional[datetime] = None) -> dict:
+    """Close open proposals that reached quorum or whose start time has passed.
+
+    Accepted proposals turn their shadow event into a regular event; the shadows of the
+    others are removed. Each group's members get one push per closed proposal, queued in
+    the same transaction. Returns the number of proposals closed per outcome.
+    """
+    now = now or datetime.now()
+    today, current_time = now.date().isoformat(), now.strftime("%H:%M:%S")
+    closed = {"accepted": 0, "rejected": 0, "expired": 0}
+    touched_dates = []
+    while True:
+        rows = db.execute(text("""
+            SELECT id, group_id, title, description, date, start_time, end_time, shadow_event_id,
+                   votes_yes, votes_no, votes_maybe, votes_pending
+            FROM meeting_proposals
+            WHERE status = 'open'
+              AND (
+                    date < :today OR (date = :today AND start_time <= :time)
+                    OR votes_pending = 0
+                    OR votes_yes * 2 > votes_yes + votes_no + votes_maybe + votes_pending
+              )
+            ORDER BY id
+            LIMIT :limit
+        """), {"today": today, "time": current_time, "limit": PROPOSAL_FINALIZE_BATCH}).fetchall()
+        members: dict[int, list[int]] = {row.group_id: [] for row in rows}
+        for gid, user_id in db.query(models.GroupMember.group_id, models.GroupMember.user_id).filter(models.GroupMember.group_id.in_(list(members))).all():
+            members[gid].append(user_id)
+        for row in rows:
+            outcome = _proposal_outcome(row)
+            # Status first: the events triggers only act on open proposals, so changing or
+            # deleting the shadow below no longer deletes the proposal with it.
+            db.execute(text("""
+                UPDATE meeting_proposals SET status = :status, closed_at = CURRENT_TIMESTAMP
+                WHERE id = :proposal_id
+            """), {"status": outcome, "proposal_id": row.id})
+            shadow = db.query(models.Event).filter_by(id=row.shadow_event_id).first() if row.shadow_event_id else None
+            if shadow and outcome == "accepted":
+                shadow.title = row.title
+                shadow.description = row.description or None
+                shadow.kind = EVENT_KIND_REGULAR
+                shadow.version = (shadow.version or 1) + 1
+                _record_change(db, shadow.group_id, "event", shadow.id)
+            elif shadow:
+                _record_change(db, shadow.group_id, "event", shadow.id, "delete")
+                db.delete(shadow)
+                db.execute(text("UPDATE meeting_proposals SET shadow_event_id = NULL WHERE id = :proposal_id"), {"proposal_id": row.id})
+            if shadow:
+                db.flush()
+                _refresh_event_busy(db, _event_busy_key(shadow))
+            _record_change(db, row.group_id, "proposal", row.id, action=outcome)
+            when = f"{str(row.date)[8:10]}.{str(row.date)[5:7]} {str(row.start_time)[:5]}–{str(row.end_time)[:5]}"
+            _enqueue_push(db, members[row.group_id], PROPOSAL_OUTCOME_TITLES[outcome], f"{row.title} · {when}", "/", f"opentime-proposal-{row.id}")
+            closed[outcome] += 1
+            if shadow:
+                touched_dates.append((row.group_id, shadow.date))
+        db.commit()
+        if len(rows) < PROPOSAL_FINALIZE_BATCH:
+            break
+
+    for group_id, shadow_date in touched_dates:
+        month_cache.invalidate_dates(group_id, shadow_date)
+    return closed
+
+
+def _proposal_finalizer_loop(interval: int) -> None:
+    # Every worker polls; the lease row makes sure only one of them runs a given pass.
+    poll = max(1, min(interval, 60))
+    while True:
+        try:
+            if _acquire_scheduler_lease(PROPOSAL_FINALIZER_LEASE, max(interval, 60)):
+                db = SessionLocal()
+                try:
+                    closed = _finalize_meeting_proposals(db)
+                    if any(closed.values()):
+                        logger.info("Proposal finalizer closed %s", closed)
+                except Exception:
+                    db.rollback()
+                    logger.exception("Proposal finalizer failed")
+                finally:
+                    db.close()
+                    _release_scheduler_lease(PROPOSAL_FINALIZER_LEASE, interval)
+        except Exception:
+            logger.exception("Proposal finalizer lease failed")
+        if _proposal_finalizer_stop.wait(poll):
+            return
+
+
+def _start_proposal_finalizer() -> None:
+    if PROPOSAL_FINALIZE_INTERVAL_SECONDS <= 0:
+        return
+    _proposal_finalizer_stop.clear()
+    threading.Thread(target=_proposal_finalizer_loop, args=(PROPOSAL_FINALIZE_INTERVAL_SECONDS,), daemon=True).start()
 
 
 def _proposal_membership_or_404(group_id: int, current_user, db: Session):
@@ -275,81 +1302,90 @@ def _proposal_membership_or_404(group_id: int, current_user, db: Session):
     return membership
 
 
-def _serialize_proposal_row(row, current_user_id: int, db: Session):
-    proposal_id = row.id if hasattr(row, 'id') else row[0]
-    group_id = row.group_id if hasattr(row, 'group_id') else row[1]
-    votes_rows = db.execute(text("""
-        SELECT u.id, u.username, COALESCE(u.full_name, u.username) AS display_name, mpv.vote
-        FROM group_members gm
-        JOIN users u ON u.id = gm.user_id
-        LEFT JOIN meeting_proposal_votes mpv
-            ON mpv.user_id = gm.user_id AND mpv.proposal_id = :proposal_id
-        WHERE gm.group_id = :group_id
-        ORDER BY display_name ASC
-    """), {"proposal_id": proposal_id, "group_id": group_id}).fetchall()
+def _serialize_proposal_rows(rows, current_user_id: int, db: Session, with_members: bool = False) -> list[dict]:
+    """Serialize a page of proposal rows; summaries come from the materialized tally columns.
 
+    Lists cost two queries (creators, the viewer's own votes). The per-member roster is only
+    loaded with with_members=True, i.e. when a single proposal is opened or changed.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    proposal_ids = sorted({int(row.id) for row in rows})
+    group_ids = sorted({int(row.group_id) for row in rows})
+    id_list = ','.join(str(pid) for pid in proposal_ids)
+
+    rosters: dict[int, list[tuple[int, str, str]]] = {gid: [] for gid in group_ids}
     avatar_map = {}
-    try:
-        user_ids = [row[0] for row in votes_rows]
-        if user_ids:
-            users = db.query(models.User).filter(models.User.id.in_(user_ids)).all()
-            avatar_map = {user.id: _get_user_avatar_value(user) for user in users}
-    except Exception:
-        avatar_map = {}
-
-    summary = {"yes": 0, "no": 0, "maybe": 0, "pending": 0}
-    members = []
-    current_user_vote = None
-    for user_id, username, display_name, vote in votes_rows:
-        if vote in summary:
-            summary[vote] += 1
-        else:
-            summary["pending"] += 1
-        if user_id == current_user_id:
-            current_user_vote = vote
-        members.append({
-            "user_id": user_id,
-            "login": username,
-            "name": display_name,
-            "vote": vote or "pending",
-            "avatar": avatar_map.get(user_id),
-        })
+    votes: dict[int, dict[int, str]] = {pid: {} for pid in proposal_ids}
+    if with_members:
+        display_name = func.coalesce(models.User.full_name, models.User.username)
+        roster_rows = (
+            db.query(models.GroupMember.group_id, models.User, display_name.label("display_name"))
+            .join(models.User, models.User.id == models.GroupMember.user_id)
+            .filter(models.GroupMember.group_id.in_(group_ids))
+            .order_by(display_name.asc())
+            .all()
+        )
+        for gid, user, name in roster_rows:
+            rosters[gid].append((user.id, user.username, name))
+            avatar_map[user.id] = _get_user_avatar_value(user)
+        vote_rows = db.execute(text(f"SELECT proposal_id, user_id, vote FROM meeting_proposal_votes WHERE proposal_id IN ({id_list})")).fetchall()
+    else:
+        creator_ids = {int(row.creator_id) for row in rows}
+        for user in db.query(models.User).filter(models.User.id.in_(creator_ids)).all():
+            avatar_map[user.id] = _get_user_avatar_value(user)
+        vote_rows = db.execute(text(f"""
+            SELECT proposal_id, user_id, vote FROM meeting_proposal_votes
+            WHERE user_id = :user_id AND proposal_id IN ({id_list})
+        """), {"user_id": current_user_id}).fetchall()
+    for proposal_id, user_id, vote in vote_rows:
+        votes[proposal_id][user_id] = vote
 
-    return {
-        "id": proposal_id,
-        "group_id": group_id,
-        "creator_id": row.creator_id,
-        "creator_name": row.creator_name,
-        "creator_avatar": avatar_map.get(row.creator_id),
-        "creator_login": row.creator_login,
-        "title": row.title,
-        "description": row.description or "",
-        "date": str(row.date),
-        "start_time": str(row.start_time)[:5],
-        "end_time": str(row.end_time)[:5],
-        "status": row.status or "open",
-        "shadow_event_id": row.shadow_event_id,
-        "created_at": str(row.created_at),
-        "current_user_vote": current_user_vote or "pending",
-        "summary": summary,
-        "members": members,
-        "calendar_badge": "СБОР",
-    }
+    result = []
+    for row in rows:
+        proposal_votes = votes.get(row.id, {})
+        item = {
+            "id": row.id,
+            "group_id": row.group_id,
+            "creator_id": row.creator_id,
+            "creator_name": row.creator_name,
+            "creator_avatar": avatar_map.get(row.creator_id),
+            "creator_login": row.creator_login,
+            "title": row.title,
+            "description": row.description or "",
+            "date": str(row.date),
+            "start_time": str(row.start_time)[:5],
+            "end_time": str(row.end_time)[:5],
+            "status": row.status or "open",
+            "shadow_event_id": row.shadow_event_id,
+            "created_at": str(row.created_at),
+            "current_user_vote": proposal_votes.get(current_user_id) or "pending",
+            "summary": {
+                "yes": row.votes_yes or 0,
+                "no": row.votes_no or 0,
+                "maybe": row.votes_maybe or 0,
+                "pending": row.votes_pending or 0,
+            },
+            "calendar_badge": "СБОР",
+        }
+        if with_members:
+            item["members"] = [
+                {
+                    "user_id": user_id,
+                    "login": username,
+                    "name": name,
+                    "vote": proposal_votes.get(user_id) or "pending",
+                    "avatar": avatar_map.get(user_id),
+                }
+                for user_id, username, name in rosters.get(row.group_id, ())
+            ]
+        result.append(item)
+    return result
 
 
-def _merge_intervals(intervals: list[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime]]:
-    if not intervals:
-        return []
-    intervals = sorted(intervals, key=lambda x: x[0])
-    merged: list[tuple[datetime, datetime]] = [intervals[0]]
-    for start, end in intervals[1:]:
-        last_start, last_end = merged[-1]
-        if start <= last_end:
-            if end > last_end:
-                merged[-1] = (last_start, end)
-        else:
-            merged.append((start, end))
-    return merged
+def _serialize_proposal_row(row, current_user_id: int, db: Session):
+    return _serialize_proposal_rows([row], current_user_id, db, with_members=True)[0]
 
 
 def _format_slot_label(start: datetime, end: datetime) -> str:
@@ -374,15 +1410,36 @@ def _extract_proposal_meta(description: str | None) -> tuple[dict, str]:
     return meta, visible.lstrip("\n")
 
 
-def _build_proposal_description(visible: str | None, meta: dict | None = None) -> str:
-    data = meta or {"votes_yes": [], "votes_no": []}
-    return f"{PROPOSAL_META_PREFIX}{json.dumps(data, ensure_ascii=False)}\n{(visible or '').strip()}"
+def _load_event_votes(db: Session, event_ids) -> dict[int, dict[str, list[int]]]:
+    ids = sorted({int(eid) for eid in event_ids or [] if eid})
+    votes = {eid: {"yes": [], "no": []} for eid in ids}
+    if not ids:
+        return votes
+    rows = db.execute(text(f"""
+        SELECT event_id, user_id, vote
+        FROM event_proposal_votes
+        WHERE event_id IN ({','.join(str(eid) for eid in ids)})
+        ORDER BY updated_at ASC, id ASC
+    """)).fetchall()
+    for event_id, user_id, vote in rows:
+        if vote in ("yes", "no"):
+            votes[event_id][vote].append(user_id)
+    return votes
+
+
+EVENT_KIND_REGULAR = "regular"
+EVENT_KIND_LEGACY_PROPOSAL = "legacy_proposal"
+EVENT_KIND_PROPOSAL_SHADOW = "proposal_shadow"
 
 
 def _is_proposal_event(ev) -> bool:
-    title = getattr(ev, 'title', '') or ''
-    description = getattr(ev, 'description', '') or ''
-    return title.startswith('ВСТРЕЧА ·') or title.startswith('📌 ') or description.startswith(PROPOSAL_META_PREFIX)
+    return getattr(ev, 'kind', None) == EVENT_KIND_LEGACY_PROPOSAL
+
+
+def _regular_event_filters():
+    # Legacy proposals and shadows of open meeting proposals carry their own kind, so calendar
+    # feeds filter on an indexed column instead of sniffing titles and descriptions.
+    return [models.Event.kind == EVENT_KIND_REGULAR]
 
 
 
@@ -453,24 +1510,25 @@ def _get_user_avatar_value(user):
             return value
     return None
 
-def _serialize_event(ev, user, member_color):
-    meta, visible_description = _extract_proposal_meta(getattr(ev, 'description', None))
+def _serialize_event(ev, user, member_color, votes: dict | None = None):
     return {
         "id": ev.id,
         "title": ev.title,
-        "description": visible_description,
+        "description": ev.description,
         "date": ev.date,
         "start_time": ev.start_time,
         "end_time": ev.end_time,
         "user_id": ev.user_id,
         "group_id": ev.group_id,
         "created_at": ev.created_at,
+        "updated_at": getattr(ev, 'updated_at', None),
+        "version": getattr(ev, 'version', None) or 1,
         "creator_login": user.username,
         "creator_name": user.full_name or user.username,
         "creator_avatar": _get_user_avatar_value(user),
         "color": member_color or user.color or "#007AFF",
-        "proposal_votes_yes": meta.get("votes_yes", []),
-        "proposal_votes_no": meta.get("votes_no", []),
+        "proposal_votes_yes": (votes or {}).get("yes", []),
+        "proposal_votes_no": (votes or {}).get("no", []),
     }
 
 app = FastAPI(title="Календарь совместных планов API", version="0.2.0")
@@ -487,6 +1545,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -497,6 +1556,37 @@ def _startup_migrations():
     _ensure_groups_columns()
     _ensure_group_members_columns()
     _ensure_meeting_proposal_tables()
+    _ensure_events_columns()
+    _ensure_events_indexes()
+    _ensure_event_proposal_votes_table()
+    _ensure_change_log_table()
+    _ensure_meeting_proposal_triggers()
+    _ensure_busy_index_table()
+    _ensure_scheduler_leases_table()
+    _ensure_push_subscriptions_table()
+    _ensure_push_outbox_table()
+    _ensure_push_digest_table()
+    _ensure_email_outbox_table()
+
+
+@app.on_event("startup")
+def _start_background_workers():
+    hash_pool.start()
+    _start_proposal_sweeper()
+    _start_proposal_finalizer()
+    _start_push_dispatcher()
+    _start_email_outbox()
+
+
+@app.on_event("shutdown")
+def _stop_background_workers():
+    _proposal_sweeper_stop.set()
+    _proposal_finalizer_stop.set()
+    _push_dispatcher_stop.set()
+    _push_wakeup.set()
+    _email_outbox_stop.set()
+    _email_wakeup.set()
+    hash_pool.shutdown()
 
 
 @app.post("/api/register", response_model=schemas.UserResponse)
@@ -528,16 +1618,16 @@ def request_password_reset(payload: schemas.PasswordResetRequest, db: Session =
     if not user:
         return {"detail": "Если email существует, код восстановления отправлен."}
 
+    if not smtp_configured():
+        raise HTTPException(status_code=500, detail="Не удалось отправить письмо: SMTP не настроен")
+
     token = f"{random.randint(100000, 999999)}"
     user.reset_token = token
     user.reset_token_expires_at = datetime.utcnow() + timedelta(minutes=30)
+    # Sent by the email outbox worker, so a slow SMTP host never holds up this request.
+    _enqueue_reset_email(db, user)
     db.commit()
 
-    try:
-        send_reset_email(user.email, token)
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"Не удалось отправить письмо: {exc}")
-
     return {"detail": "Код восстановления отправлен на почту.", "token": token}
 
 
@@ -551,6 +1641,7 @@ def confirm_password_reset(payload: schemas.PasswordResetConfirm, db: Session =
     user.reset_token = None
     user.reset_token_expires_at = None
     db.commit()
+    principal_cache.forget_user(user.id)
     return {"detail": "Пароль обновлен"}
 
 
@@ -562,12 +1653,17 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     else:
         user = db.query(models.User).filter(models.User.username == identifier).first()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = verify_and_update(form_data.password, user.hashed_password) if user else (False, None)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверное имя пользователя или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored with older hash parameters (OPENTIME_PBKDF2_ROUNDS changed): upgrade in place.
+        user.hashed_password = new_hash
+        db.commit()
 
     token = create_access_token(data={"sub": str(user.id)}, expires_delta=timedelta(minutes=30))
     return schemas.Token(access_token=token)
@@ -575,7 +1671,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 @app.get("/api/push/public-key")
 def get_push_public_key(current_user: models.User = Depends(get_current_user)):
-    return {"public_key": VAPID_PUBLIC_KEY, "supported": webpush is not None}
+    return {"public_key": VAPID_PUBLIC_KEY, "supported": push_sender.available}
 
 
 @app.post("/api/push/subscribe")
@@ -593,8 +1689,9 @@ def unsubscribe_push(payload: dict = Body(...), current_user: models.User = Depe
 
 
 @app.post("/api/push/test")
-def test_push(current_user: models.User = Depends(get_current_user)):
-    _send_push_to_users([current_user.id], "Тест OpenTime", "Push-уведомления подключены.", "/", "opentime-test")
+def test_push(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    _enqueue_push(db, [current_user.id], "Тест OpenTime", "Push-уведомления подключены.", "/", "opentime-test")
+    db.commit()
     return {"ok": True}
 
 
@@ -612,13 +1709,17 @@ def update_me(payload: schemas.UserUpdate, current_user: models.User = Depends(g
     )
     if exists:
         raise HTTPException(status_code=400, detail="Login уже занят")
-    current_user.username = payload.username
-    current_user.full_name = payload.full_name
-    if hasattr(payload, "avatar") and payload.avatar is not None and hasattr(current_user, "avatar"):
-        current_user.avatar = payload.avatar
+    user = current_user.load()
+    user.username = payload.username
+    user.full_name = payload.full_name
+    if hasattr(payload, "avatar") and payload.avatar is not None and hasattr(user, "avatar"):
+        user.avatar = payload.avatar
+    _bump_user_group_versions(db, user.id)
     db.commit()
-    db.refresh(current_user)
-    return _serialize_user(current_user)
+    principal_cache.forget_user(user.id)
+    month_cache.invalidate_groups(_user_group_ids(db, user.id))
+    db.refresh(user)
+    return _serialize_user(user)
 
 
 @app.post("/api/groups", response_model=schemas.GroupResponse)
@@ -637,12 +1738,18 @@ def create_group(group: schemas.GroupCreate, current_user: models.User = Depends
     if not db.query(models.GroupMember).filter_by(user_id=current_user.id, group_id=db_group.id).first():
         db.add(models.GroupMember(user_id=current_user.id, group_id=db_group.id, color=current_user.color))
         db.commit()
+    _retarget_streams(db, [current_user.id])
     setattr(db_group, "member_color", current_user.color)
     return _serialize_group(db_group, current_user.color, current_user.color or "#007AFF")
 
 
 @app.get("/api/groups", response_model=List[schemas.GroupResponse])
-def get_my_groups(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_my_groups(request: Request, response: Response, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    etag = _weak_etag("groups", current_user.id, current_user.color, _group_versions(db, current_user.id))
+    cached = _not_modified(request, etag)
+    if cached:
+        return cached
+    _set_etag(response, etag)
     groups = (
         db.query(models.Group, models.GroupMember.color.label("member_color"))
         .join(models.GroupMember, models.GroupMember.group_id == models.Group.id)
@@ -674,10 +1781,15 @@ def get_group(group_id: int, current_user: models.User = Depends(get_current_use
 
 
 @app.get("/api/groups/{group_id}/members", response_model=List[schemas.GroupMember])
-def get_group_members(group_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    allowed = db.query(models.GroupMember).filter_by(group_id=group_id, user_id=current_user.id).first()
-    if not allowed:
+def get_group_members(group_id: int, request: Request, response: Response, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    versions = _group_versions(db, current_user.id, group_id)
+    if not versions:
         raise HTTPException(status_code=404, detail="Группа не найдена или вы не состоите в ней")
+    etag = _weak_etag("members", versions)
+    cached = _not_modified(request, etag)
+    if cached:
+        return cached
+    _set_etag(response, etag)
     rows = (
         db.query(models.User, models.GroupMember.color)
         .join(models.GroupMember, models.GroupMember.user_id == models.User.id)
@@ -705,6 +1817,7 @@ def update_group(group_id: int, payload: schemas.GroupUpdate, current_user: mode
     if group.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Только админ группы может менять название")
     group.name = payload.name
+    _bump_group_versions(db, [group.id])
     db.commit()
     db.refresh(group)
     membership = db.query(models.GroupMember).filter_by(group_id=group.id, user_id=current_user.id).first()
@@ -721,6 +1834,7 @@ def update_group_color(group_id: int, payload: schemas.UserColorUpdate, current_
     if not membership:
         raise HTTPException(status_code=404, detail="Вы не состоите в группе")
     membership.color = payload.color
+    _bump_group_versions(db, [group.id])
     db.commit()
     db.refresh(group)
     setattr(group, "member_color", payload.color)
@@ -747,16 +1861,28 @@ def leave_group(group_id: int, current_user: models.User = Depends(get_current_u
             next_owner = random.choice(other_members)
             group.owner_id = next_owner.user_id
             db.delete(membership)
+            db.flush()
+            _recompute_proposal_tallies(db, group_id=group_id)
+            _bump_group_versions(db, [group_id])
             db.commit()
+            _retarget_streams(db, [current_user.id])
             return {"detail": "Вы вышли из группы. Права админа переданы другому участнику."}
         else:
+            busy_keys = _group_busy_keys(db, group_id)
             db.delete(membership)
             db.delete(group)
+            _refresh_event_busy(db, *busy_keys)
             db.commit()
+            month_cache.invalidate_groups([group_id])
+            _retarget_streams(db, [current_user.id])
             return {"detail": "Вы вышли из группы. Группа удалена, так как участников больше не осталось."}
 
     db.delete(membership)
+    db.flush()
+    _recompute_proposal_tallies(db, group_id=group_id)
+    _bump_group_versions(db, [group_id])
     db.commit()
+    _retarget_streams(db, [current_user.id])
     return {"detail": "Вы вышли из группы"}
 
 
@@ -767,8 +1893,13 @@ def delete_group(group_id: int, current_user: models.User = Depends(get_current_
         raise HTTPException(status_code=404, detail="Группа не найдена")
     if group.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Удалить группу может только создатель")
+    busy_keys = _group_busy_keys(db, group_id)
+    member_ids = [row[0] for row in db.query(models.GroupMember.user_id).filter(models.GroupMember.group_id == group_id).all()]
     db.delete(group)
+    _refresh_event_busy(db, *busy_keys)
     db.commit()
+    month_cache.invalidate_groups([group_id])
+    _retarget_streams(db, member_ids)
     return {"detail": "Группа удалена"}
 
 
@@ -793,7 +1924,11 @@ def join_by_invite(invite_code: str, current_user: models.User = Depends(get_cur
     exists = db.query(models.GroupMember).filter_by(group_id=group.id, user_id=current_user.id).first()
     if not exists:
         db.add(models.GroupMember(group_id=group.id, user_id=current_user.id, color=current_user.color))
+        db.flush()
+        _recompute_proposal_tallies(db, group_id=group.id)
+        _bump_group_versions(db, [group.id])
         db.commit()
+        _retarget_streams(db, [current_user.id])
     db.refresh(group)
     setattr(group, "member_color", current_user.color)
     return _serialize_group(group, current_user.color, current_user.color or "#007AFF")
@@ -801,10 +1936,14 @@ def join_by_invite(invite_code: str, current_user: models.User = Depends(get_cur
 
 @app.put("/api/users/me/color", response_model=schemas.UserResponse)
 def update_my_color(payload: schemas.UserColorUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    current_user.color = payload.color
+    user = current_user.load()
+    user.color = payload.color
+    _bump_user_group_versions(db, user.id)
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    principal_cache.forget_user(user.id)
+    month_cache.invalidate_groups(_user_group_ids(db, user.id))
+    db.refresh(user)
+    return user
 
 
 @app.post("/api/events", response_model=schemas.EventResponse)
@@ -823,7 +1962,8 @@ def create_event(event: schemas.EventCreate, current_user: models.User = Depends
     is_proposal = str(event.title or '').startswith('ВСТРЕЧА ·') or str(event.title or '').startswith('📌 ')
     db_event = models.Event(
         title=event.title,
-        description=_build_proposal_description(event.description) if is_proposal else event.description,
+        description=event.description,
+        kind=EVENT_KIND_LEGACY_PROPOSAL if is_proposal else EVENT_KIND_REGULAR,
         date=event.date,
         start_time=event.start_time,
         end_time=event.end_time,
@@ -831,14 +1971,18 @@ def create_event(event: schemas.EventCreate, current_user: models.User = Depends
         group_id=target_group_id,
     )
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    db.flush()
+    _record_change(db, target_group_id, "event", db_event.id, action="created")
+    _refresh_event_busy(db, _event_busy_key(db_event))
     if not is_proposal:
         member_ids = [row[0] for row in db.query(models.GroupMember.user_id).filter(models.GroupMember.group_id == event.group_id, models.GroupMember.user_id != current_user.id).all()]
         if member_ids:
             group = db.query(models.Group).filter_by(id=event.group_id).first()
             when = f"{event.date.strftime('%d.%m')} · {db_event.start_time.strftime('%H:%M') if db_event.start_time else ''}".strip()
-            _send_push_to_users_async(member_ids, f"Новый план в группе «{group.name if group else 'OpenTime'}»", f"{current_user.full_name or current_user.username}: {db_event.title} {when}".strip(), "/", "opentime-event")
+            _enqueue_group_push(db, member_ids, event.group_id, "event", f"Новый план в группе «{group.name if group else 'OpenTime'}»", f"{current_user.full_name or current_user.username}: {db_event.title} {when}".strip())
+    db.commit()
+    month_cache.invalidate_dates(target_group_id, db_event.date)
+    db.refresh(db_event)
     return {
         **db_event.__dict__,
         "creator_login": current_user.username,
@@ -857,13 +2001,19 @@ def update_event(event_id: int, payload: schemas.EventUpdate, current_user: mode
         raise HTTPException(status_code=403, detail="Редактировать можно только свои события")
     if payload.start_time and payload.end_time and payload.start_time >= payload.end_time:
         raise HTTPException(status_code=400, detail="Конец должен быть позже начала")
+    previous_date = ev.date
+    previous_busy_key = _event_busy_key(ev)
     ev.title = payload.title
     ev.date = payload.date
     ev.start_time = payload.start_time
     ev.end_time = payload.end_time
     if hasattr(payload, "description"):
         ev.description = payload.description
+    ev.version = (ev.version or 1) + 1
+    _record_change(db, ev.group_id, "event", ev.id)
+    _refresh_event_busy(db, previous_busy_key, _event_busy_key(ev))
     db.commit()
+    month_cache.invalidate_dates(ev.group_id, previous_date, ev.date)
     db.refresh(ev)
     membership = db.query(models.GroupMember).filter_by(group_id=ev.group_id, user_id=current_user.id).first()
     return {
@@ -880,27 +2030,49 @@ def delete_event(event_id: int, current_user: models.User = Depends(get_current_
     ev = db.query(models.Event).filter_by(id=event_id).first()
     if not ev:
         raise HTTPException(status_code=404, detail="Событие не найдено")
-    proposal_row = db.execute(text("SELECT id, creator_id, shadow_event_id FROM meeting_proposals WHERE shadow_event_id = :event_id AND COALESCE(status, 'open') = 'open'"), {"event_id": event_id}).fetchone()
+    proposal_row = db.execute(text("SELECT id, creator_id, shadow_event_id FROM meeting_proposals WHERE shadow_event_id = :event_id AND status = 'open'"), {"event_id": event_id}).fetchone()
     if proposal_row:
         if proposal_row.creator_id != current_user.id:
             raise HTTPException(status_code=403, detail="Удалить можно только своё предложение встречи")
         db.execute(text("DELETE FROM meeting_proposal_votes WHERE proposal_id = :proposal_id"), {"proposal_id": proposal_row.id})
         db.execute(text("DELETE FROM meeting_proposals WHERE id = :proposal_id"), {"proposal_id": proposal_row.id})
+        _record_change(db, ev.group_id, "proposal", proposal_row.id, "delete")
+        _record_change(db, ev.group_id, "event", ev.id, "delete")
         db.delete(ev)
+        _refresh_event_busy(db, _event_busy_key(ev))
         db.commit()
         return {"detail": "Предложение встречи удалено"}
     if ev.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Удалить можно только своё событие")
+    _record_change(db, ev.group_id, "event", ev.id, "delete")
     db.delete(ev)
+    _refresh_event_busy(db, _event_busy_key(ev))
     db.commit()
+    month_cache.invalidate_dates(ev.group_id, ev.date)
     return {"detail": "Событие удалено"}
 
 
 @app.get("/api/events", response_model=List[schemas.EventResponse])
-def get_events(group_id: Optional[int] = Query(default=None), year: Optional[int] = Query(default=None, ge=1900, le=3000), month: Optional[int] = Query(default=None, ge=1, le=12), current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_events(request: Request, response: Response, group_id: Optional[int] = Query(default=None), year: Optional[int] = Query(default=None, ge=1900, le=3000), month: Optional[int] = Query(default=None, ge=1, le=12), current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     if group_id is None:
         personal_group, _ = _ensure_personal_group(db, current_user)
         group_id = personal_group.id
+    versions = _group_versions(db, current_user.id, group_id)
+    etag = _weak_etag("events", current_user.id, group_id, year, month, versions)
+    cached = _not_modified(request, etag)
+    if cached:
+        return cached
+    _set_etag(response, etag)
+    if not versions:
+        return []
+    cacheable = month_cache.enabled and year is not None and month is not None
+    if cacheable:
+        # Every row carries the viewer's membership colour, so members that share a colour share an entry.
+        variant = db.query(models.GroupMember.color).filter_by(group_id=group_id, user_id=current_user.id).scalar() or ""
+        body = month_cache.get(group_id, year, month, variant)
+        if body is not None:
+            return Response(content=body, media_type="application/json", headers=_etag_headers(etag))
+        generation = month_cache.generation(group_id, year, month)
     q = (
         db.query(models.Event, models.User, models.GroupMember.color.label("member_color"))
         .join(models.GroupMember, models.GroupMember.group_id == models.Event.group_id)
@@ -914,16 +2086,251 @@ def get_events(group_id: Optional[int] = Query(default=None), year: Optional[int
         start = dt_date(year, month, 1)
         end = dt_date(year + 1, 1, 1) if month == 12 else dt_date(year, month + 1, 1)
         q = q.filter(models.Event.date >= start, models.Event.date < end)
+    q = q.filter(*_regular_event_filters())
     rows = q.order_by(models.Event.date.asc(), models.Event.start_time.asc().nulls_last()).all()
-    out = []
-    for ev, user, member_color in rows:
-        if _is_proposal_event(ev):
-            continue
-        linked = db.execute(text("SELECT 1 FROM meeting_proposals WHERE shadow_event_id = :event_id AND COALESCE(status, 'open') = 'open' LIMIT 1"), {"event_id": ev.id}).fetchone()
-        if linked:
-            continue
-        out.append(_serialize_event(ev, user, member_color))
-    return out
+    items = [_serialize_event(ev, user, member_color) for ev, user, member_color in rows]
+    if not cacheable:
+        return items
+    payload = jsonable_encoder([schemas.EventResponse.parse_obj(item) for item in items])
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    month_cache.set(group_id, year, month, body, generation, variant)
+    return Response(content=body, media_type="application/json", headers=_etag_headers(etag))
+
+
+# Events without a start time sort after timed ones; the same key drives the keyset cursor.
+EVENT_SORT_TIME = func.coalesce(models.Event.start_time, literal_column("'24:00:00'"))
+
+
+def _encode_event_cursor(ev) -> str:
+    sort_time = ev.start_time.strftime("%H:%M:%S.%f") if ev.start_time else "24:00:00"
+    return f"{ev.date.isoformat()}|{sort_time}|{ev.id}"
+
+
+def _decode_event_cursor(cursor: str) -> tuple[dt_date, str, int]:
+    try:
+        date_value, sort_time, event_id = cursor.split("|")
+        return dt_date.fromisoformat(date_value), sort_time, int(event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+@app.get("/api/events/range", response_model=schemas.EventRangeResponse)
+def get_events_range(
+    date_from: dt_date = Query(alias="from"),
+    date_to: dt_date = Query(alias="to"),
+    group_ids: Optional[List[int]] = Query(default=None),
+    limit: int = Query(default=500, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="Конец диапазона должен быть позже начала")
+    q = (
+        db.query(models.Event, models.User, models.GroupMember.color.label("member_color"))
+        .join(models.GroupMember, (models.GroupMember.group_id == models.Event.group_id) & (models.GroupMember.user_id == current_user.id))
+        .join(models.User, models.User.id == models.Event.user_id)
+        .filter(models.Event.date >= date_from, models.Event.date < date_to)
+    )
+    if group_ids:
+        q = q.filter(models.Event.group_id.in_(group_ids))
+    if cursor:
+        after_date, after_time, after_id = _decode_event_cursor(cursor)
+        after_time = literal(after_time)
+        q = q.filter(or_(
+            models.Event.date > after_date,
+            and_(models.Event.date == after_date, EVENT_SORT_TIME > after_time),
+            and_(models.Event.date == after_date, EVENT_SORT_TIME == after_time, models.Event.id > after_id),
+        ))
+    q = q.filter(*_regular_event_filters())
+    rows = q.order_by(models.Event.date.asc(), EVENT_SORT_TIME.asc(), models.Event.id.asc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [_serialize_event(ev, user, member_color) for ev, user, member_color in rows],
+        "next_cursor": _encode_event_cursor(rows[-1][0]) if has_more else None,
+    }
+
+
+SYNC_PAGE_SIZE = 500
+
+
+@app.get("/api/sync")
+def sync_changes(
+    since: Optional[int] = Query(default=None, ge=0),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    group_ids = [row[0] for row in db.query(models.GroupMember.group_id).filter(models.GroupMember.user_id == current_user.id).all()]
+    if since is None:
+        # No cursor yet: the client loads its views normally and starts syncing from "now".
+        latest = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM change_log")).scalar()
+        return {"cursor": int(latest or 0), "events": [], "deleted_events": [], "proposals": [], "deleted_proposals": [], "has_more": False}
+    if not group_ids:
+        return {"cursor": since, "events": [], "deleted_events": [], "proposals": [], "deleted_proposals": [], "has_more": False}
+
+    changes = db.execute(text(f"""
+        SELECT id, entity, entity_id, op
+        FROM change_log
+        WHERE group_id IN ({','.join(str(int(gid)) for gid in group_ids)}) AND id > :since
+        ORDER BY id ASC
+        LIMIT :limit
+    """), {"since": since, "limit": SYNC_PAGE_SIZE + 1}).fetchall()
+    has_more = len(changes) > SYNC_PAGE_SIZE
+    changes = changes[:SYNC_PAGE_SIZE]
+    cursor = changes[-1].id if changes else since
+
+    # Only the latest operation per entity matters within one page.
+    latest_ops: dict[tuple[str, int], str] = {}
+    for change in changes:
+        latest_ops[(change.entity, change.entity_id)] = change.op
+    event_ids = [eid for (entity, eid), op in latest_ops.items() if entity == "event" and op != "delete"]
+    proposal_ids = [pid for (entity, pid), op in latest_ops.items() if entity == "proposal" and op != "delete"]
+    deleted_events = [eid for (entity, eid), op in latest_ops.items() if entity == "event" and op == "delete"]
+    deleted_proposals = [pid for (entity, pid), op in latest_ops.items() if entity == "proposal" and op == "delete"]
+
+    events = []
+    if event_ids:
+        rows = (
+            db.query(models.Event, models.User, models.GroupMember.color.label("member_color"))
+            .join(models.GroupMember, (models.GroupMember.group_id == models.Event.group_id) & (models.GroupMember.user_id == current_user.id))
+            .join(models.User, models.User.id == models.Event.user_id)
+            .filter(models.Event.id.in_(event_ids))
+            .filter(*_regular_event_filters())
+            .all()
+        )
+        events = [_serialize_event(ev, user, member_color) for ev, user, member_color in rows]
+
+    proposals = []
+    if proposal_ids:
+        rows = db.execute(text(f"""
+            SELECT mp.*,
+                   u.username AS creator_login,
+                   COALESCE(u.full_name, u.username) AS creator_name
+            FROM meeting_proposals mp
+            JOIN users u ON u.id = mp.creator_id
+            WHERE mp.id IN ({','.join(str(int(pid)) for pid in proposal_ids)})
+              AND mp.status = 'open'
+        """)).fetchall()
+        proposals = _serialize_proposal_rows(rows, current_user.id, db)
+        found = {item["id"] for item in proposals}
+        deleted_proposals.extend(pid for pid in proposal_ids if pid not in found)
+
+    return {
+        "cursor": cursor,
+        "events": events,
+        "deleted_events": deleted_events,
+        "proposals": proposals,
+        "deleted_proposals": deleted_proposals,
+        "has_more": has_more,
+    }
+
+
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_REPLAY_LIMIT = 200
+
+
+def _stream_message(change: dict) -> str:
+    return f"id: {change['id']}\nevent: change\ndata: {json.dumps(change, separators=(',', ':'))}\n\n"
+
+
+def _stream_replay(user_id: int, since: Optional[int]) -> tuple[int, list[dict], bool]:
+    """Changes after `since` for a reconnecting stream; returns (cursor, changes, overflowed)."""
+    db = SessionLocal()
+    try:
+        if since is None:
+            return int(db.execute(text("SELECT COALESCE(MAX(id), 0) FROM change_log")).scalar() or 0), [], False
+        group_ids = _user_group_ids(db, user_id)
+        if not group_ids:
+            return since, [], False
+        rows = db.execute(text(f"""
+            SELECT id, group_id, entity, entity_id, op
+            FROM change_log
+            WHERE group_id IN ({','.join(str(int(gid)) for gid in group_ids)}) AND id > :since
+            ORDER BY id ASC
+            LIMIT :limit
+        """), {"since": since, "limit": STREAM_REPLAY_LIMIT + 1}).fetchall()
+    finally:
+        db.close()
+    changes = [
+        {
+            "id": row.id,
+            "group_id": row.group_id,
+            "entity": row.entity,
+            "entity_id": row.entity_id,
+            "op": row.op,
+            "action": "deleted" if row.op == "delete" else "updated",
+        }
+        for row in rows
+    ]
+    if len(changes) > STREAM_REPLAY_LIMIT:
+        return changes[-1]["id"], [], True
+    return (changes[-1]["id"] if changes else since), changes, False
+
+
+def _stream_user(token: str) -> tuple[int, list[int]]:
+    db = SessionLocal()
+    try:
+        user = user_from_token(token, db)
+        return user.id, _user_group_ids(db, user.id)
+    finally:
+        db.close()
+
+
+@app.get("/api/stream")
+async def stream_changes(
+    request: Request,
+    token: Optional[str] = Query(default=None),
+    since: Optional[int] = Query(default=None, ge=0),
+):
+    """Server-Sent Events feed of committed changes in the user's groups.
+
+    EventSource cannot set headers, so the JWT may come as ?token=. Reconnects resume from
+    Last-Event-ID (a change_log id, the same cursor as /api/sync); a gap too large to replay
+    or a consumer that falls behind gets a "resync" event and should call /api/sync.
+    No DB session is held while the connection idles.
+    """
+    auth_header = request.headers.get("authorization") or ""
+    raw_token = token or (auth_header[7:] if auth_header.lower().startswith("bearer ") else "")
+    if not raw_token:
+        raise HTTPException(status_code=401, detail="Неверные учетные данные", headers={"WWW-Authenticate": "Bearer"})
+    last_event_id = request.headers.get("last-event-id") or ""
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+
+    user_id, group_ids = await run_in_threadpool(_stream_user, raw_token)
+    # Subscribe before replaying so nothing committed in between is lost; duplicates are skipped by id.
+    subscription = change_hub.subscribe(user_id, group_ids)
+
+    async def events():
+        try:
+            cursor, replay, overflowed = await run_in_threadpool(_stream_replay, user_id, since)
+            yield "retry: 5000\n\n"
+            if overflowed:
+                yield "event: resync\ndata: {}\n\n"
+            for change in replay:
+                yield _stream_message(change)
+            while True:
+                try:
+                    change = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if change is RESYNC:
+                    yield "event: resync\ndata: {}\n\n"
+                    continue
+                if change["id"] <= cursor:
+                    continue
+                cursor = change["id"]
+                yield _stream_message(change)
+        finally:
+            change_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/groups/{group_id}/proposals")
@@ -936,19 +2343,19 @@ def get_group_proposals(group_id: int, current_user: models.User = Depends(get_c
         db.query(models.Event, models.User, models.GroupMember.color.label("member_color"))
         .join(models.User, models.User.id == models.Event.user_id)
         .join(models.GroupMember, (models.GroupMember.group_id == models.Event.group_id) & (models.GroupMember.user_id == models.Event.user_id))
-        .filter(models.Event.group_id == group_id)
+        .filter(
+            models.Event.group_id == group_id,
+            models.Event.kind == EVENT_KIND_LEGACY_PROPOSAL,
+            models.Event.date >= dt_date.today(),
+        )
         .order_by(models.Event.date.asc(), models.Event.start_time.asc().nulls_last())
         .all()
     )
 
-    today = dt_date.today()
+    votes = _load_event_votes(db, [ev.id for ev, _, _ in rows])
     result = []
     for ev, user, member_color in rows:
-        if ev.date and ev.date < today:
-            continue
-        if not _is_proposal_event(ev):
-            continue
-        data = _serialize_event(ev, user, member_color)
+        data = _serialize_event(ev, user, member_color, votes.get(ev.id))
         yes = data.pop('proposal_votes_yes', [])
         no = data.pop('proposal_votes_no', [])
         data['votes_yes'] = yes
@@ -973,20 +2380,94 @@ def vote_for_proposal(event_id: int, payload: dict = Body(...), current_user: mo
     if vote not in {'yes', 'no'}:
         raise HTTPException(status_code=400, detail="vote должен быть yes или no")
 
-    meta, visible_description = _extract_proposal_meta(ev.description)
-    yes = [x for x in meta.get('votes_yes', []) if x != current_user.id]
-    no = [x for x in meta.get('votes_no', []) if x != current_user.id]
-    if vote == 'yes':
-        yes.append(current_user.id)
-    else:
-        no.append(current_user.id)
-    meta['votes_yes'] = yes
-    meta['votes_no'] = no
-    ev.description = _build_proposal_description(visible_description, meta)
+    # One upsert per vote: concurrent voters no longer overwrite each other's JSON blob.
+    db.execute(text("""
+        INSERT INTO event_proposal_votes (event_id, user_id, vote, created_at, updated_at)
+        VALUES (:event_id, :user_id, :vote, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT(event_id, user_id) DO UPDATE SET vote=excluded.vote, updated_at=CURRENT_TIMESTAMP
+    """), {"event_id": ev.id, "user_id": current_user.id, "vote": vote})
+    ev.version = (ev.version or 1) + 1
+    _record_change(db, ev.group_id, "event", ev.id, action="voted")
     db.commit()
+    month_cache.invalidate_dates(ev.group_id, ev.date)
+    votes = _load_event_votes(db, [ev.id])[ev.id]
+    yes, no = votes["yes"], votes["no"]
     return {"detail": "Голос сохранён", "vote": vote, "votes_yes": yes, "votes_no": no}
 
 
+def _group_member_rows(db: Session, group_ids: List[int]) -> dict[int, list]:
+    rows = (
+        db.query(models.GroupMember, models.User)
+        .join(models.User, models.User.id == models.GroupMember.user_id)
+        .filter(models.GroupMember.group_id.in_(group_ids))
+        .all()
+    )
+    by_group: dict[int, list] = {gid: [] for gid in group_ids}
+    for gm, user in rows:
+        by_group[gm.group_id].append((gm, user))
+    return by_group
+
+
+def _best_window_result(
+    group: models.Group,
+    member_rows: list,
+    free_busy: Optional[FreeBusy],
+    days_ahead: int,
+    min_minutes: int,
+    from_hour: int,
+    to_hour: int,
+    max_results: int,
+    **search_options,
+) -> dict:
+    member_ids = [gm.user_id for gm, _ in member_rows]
+    member_names = [user.full_name or user.username for _, user in member_rows]
+    payload = {
+        "group_id": group.id,
+        "group_name": group.name,
+        "member_count": len(member_ids),
+        "member_names": member_names,
+        "min_minutes": min_minutes,
+        "days_ahead": days_ahead,
+    }
+    if len(member_ids) < 2 or free_busy is None:
+        payload.update({
+            "window": None,
+            "alternatives": [],
+            "summary": "В группе нужен хотя бы ещё один участник, чтобы искать общее окно.",
+        })
+        return payload
+
+    slots = search_slots(free_busy, from_hour, to_hour, min_minutes, max_results, now=datetime.now(), **search_options)
+    results = [
+        {
+            "date": slot["start"].date().isoformat(),
+            "start": slot["start"].isoformat(),
+            "end": slot["end"].isoformat(),
+            "duration_minutes": min_minutes,
+            "label": _format_slot_label(slot["start"], slot["end"]),
+            "attendance": slot["attendance"],
+            "free_member_ids": slot["free_member_ids"],
+            "score": slot["score"],
+        }
+        for slot in slots
+    ]
+
+    first = results[0] if results else None
+    if first:
+        if min_minutes % 60 == 0:
+            duration_label = f"{min_minutes // 60}ч"
+        else:
+            duration_label = f"{min_minutes} мин"
+        summary = f'Ближайшее общее окно для “{group.name}”: {first["label"]} ({duration_label})'
+        if first["attendance"] < len(member_ids):
+            summary += f', свободны {first["attendance"]} из {len(member_ids)}'
+    else:
+        summary = f'В ближайшие {days_ahead} дней не найдено общего окна на {min_minutes} мин. Попробуйте уменьшить длительность.'
+
+    payload.update({"window": first, "alternatives": results[1:], "summary": summary})
+    return payload
+
+
 @app.get("/api/groups/{group_id}/best-window")
 def get_best_group_window(
     group_id: int,
@@ -995,6 +2476,11 @@ def get_best_group_window(
     from_hour: int = Query(default=9, ge=0, le=23),
     to_hour: int = Query(default=22, ge=1, le=24),
     max_results: int = Query(default=3, ge=1, le=10),
+    quorum: Optional[int] = Query(default=None, ge=1),
+    required: Optional[List[int]] = Query(default=None),
+    preferred_hour: Optional[int] = Query(default=None, ge=0, le=23),
+    stride_minutes: int = Query(default=30, ge=5, le=240),
+    rank: bool = Query(default=False),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -1006,145 +2492,246 @@ def get_best_group_window(
     if not group:
         raise HTTPException(status_code=404, detail="Группа не найдена")
 
-    member_rows = (
-        db.query(models.GroupMember, models.User)
-        .join(models.User, models.User.id == models.GroupMember.user_id)
-        .filter(models.GroupMember.group_id == group_id)
-        .all()
-    )
+    member_rows = _group_member_rows(db, [group_id])[group_id]
     member_ids = [gm.user_id for gm, _ in member_rows]
-    member_names = [user.full_name or user.username for _, user in member_rows]
+    if required and not set(required) <= set(member_ids):
+        raise HTTPException(status_code=400, detail="Обязательные участники должны состоять в группе")
+
+    free_busy = None
+    if len(member_ids) >= 2:
+        today = dt_date.today()
+        free_busy = FreeBusy.load(db, group_id, member_ids, today, today + timedelta(days=days_ahead))
+    return _best_window_result(
+        group,
+        member_rows,
+        free_busy,
+        days_ahead,
+        min_minutes,
+        from_hour,
+        to_hour,
+        max_results,
+        quorum=quorum,
+        required=required or (),
+        preferred_hour=preferred_hour,
+        stride_minutes=stride_minutes,
+        rank=rank,
+    )
 
-    if len(member_ids) < 2:
-        return {
-            "group_id": group.id,
-            "group_name": group.name,
-            "member_count": len(member_ids),
-            "member_names": member_names,
-            "min_minutes": min_minutes,
-            "days_ahead": days_ahead,
-            "window": None,
-            "alternatives": [],
-            "summary": "В группе нужен хотя бы ещё один участник, чтобы искать общее окно.",
-        }
 
-    today = dt_date.today()
-    range_end = today + timedelta(days=days_ahead)
-    events = (
-        db.query(models.Event)
-        .filter(models.Event.group_id == group_id)
-        .filter(models.Event.date >= today, models.Event.date <= range_end)
+BATCH_MAX_GROUPS = 20
+BATCH_MAX_DURATIONS = 6
+
+
+@app.get("/api/groups/best-window/batch")
+def get_best_group_windows_batch(
+    group_ids: List[int] = Query(...),
+    durations: List[int] = Query(default=[30, 60, 120]),
+    days_ahead: int = Query(default=14, ge=1, le=60),
+    from_hour: int = Query(default=9, ge=0, le=23),
+    to_hour: int = Query(default=22, ge=1, le=24),
+    max_results: int = Query(default=3, ge=1, le=10),
+    quorum: Optional[int] = Query(default=None, ge=1),
+    preferred_hour: Optional[int] = Query(default=None, ge=0, le=23),
+    stride_minutes: int = Query(default=30, ge=5, le=240),
+    rank: bool = Query(default=False),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """best-window for every (group, duration) pair; busy data is loaded once for all of them."""
+    group_ids = list(dict.fromkeys(group_ids))
+    durations = list(dict.fromkeys(durations))
+    if len(group_ids) > BATCH_MAX_GROUPS or len(durations) > BATCH_MAX_DURATIONS:
+        raise HTTPException(status_code=400, detail=f"Не больше {BATCH_MAX_GROUPS} групп и {BATCH_MAX_DURATIONS} длительностей за запрос")
+    if any(d < 15 or d > 720 for d in durations):
+        raise HTTPException(status_code=400, detail="Длительность должна быть от 15 до 720 минут")
+
+    groups = (
+        db.query(models.Group)
+        .join(models.GroupMember, models.GroupMember.group_id == models.Group.id)
+        .filter(models.Group.id.in_(group_ids), models.GroupMember.user_id == current_user.id)
         .all()
     )
+    groups_by_id = {group.id: group for group in groups}
+    if len(groups_by_id) != len(group_ids):
+        raise HTTPException(status_code=404, detail="Группа не найдена или вы не состоите в ней")
+
+    member_rows = _group_member_rows(db, group_ids)
+    searchable = {gid: [gm.user_id for gm, _ in rows] for gid, rows in member_rows.items() if len(rows) >= 2}
+    today = dt_date.today()
+    free_busy = FreeBusy.load_many(db, searchable, today, today + timedelta(days=days_ahead)) if searchable else {}
 
     results = []
-    slot_length = timedelta(minutes=min_minutes)
+    for gid in group_ids:
+        for minutes in durations:
+            results.append(_best_window_result(
+                groups_by_id[gid],
+                member_rows[gid],
+                free_busy.get(gid),
+                days_ahead,
+                minutes,
+                from_hour,
+                to_hour,
+                max_results,
+                quorum=quorum,
+                preferred_hour=preferred_hour,
+                stride_minutes=stride_minutes,
+                rank=rank,
+            ))
+    return {"days_ahead": days_ahead, "durations": durations, "results": results}
+
+
+@app.get("/api/groups/{group_id}/free-busy")
+def get_group_free_busy(
+    group_id: int,
+    days_ahead: int = Query(default=14, ge=1, le=60),
+    from_hour: int = Query(default=9, ge=0, le=23),
+    to_hour: int = Query(default=22, ge=1, le=24),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    membership = db.query(models.GroupMember).filter_by(group_id=group_id, user_id=current_user.id).first()
+    if not membership:
+        raise HTTPException(status_code=404, detail="Группа не найдена или вы не состоите в ней")
+    member_ids = [row[0] for row in db.query(models.GroupMember.user_id).filter(models.GroupMember.group_id == group_id).all()]
 
-    for offset in range(days_ahead + 1):
-        current_day = today + timedelta(days=offset)
-        day_start = datetime.combine(current_day, datetime.min.time()).replace(hour=from_hour, minute=0, second=0, microsecond=0)
-        day_end = datetime.combine(current_day, datetime.min.time()) + timedelta(hours=to_hour)
-        if day_end <= day_start:
+    today = dt_date.today()
+    free_busy = FreeBusy.load(db, group_id, member_ids, today, today + timedelta(days=days_ahead))
+    days = []
+    for current_day in free_busy.days():
+        window = day_window(current_day, from_hour, to_hour)
+        if window is None:
             continue
+        busy = free_busy.busy_by_member(current_day, window)
+        days.append({
+            "date": current_day.isoformat(),
+            "busy": [[start.isoformat(), end.isoformat()] for start, end in union_busy(busy.values())],
+            "free": [[start.isoformat(), end.isoformat()] for start, end in free_busy.free_blocks(current_day, window)],
+            "members": [
+                {"user_id": uid, "busy": [[start.isoformat(), end.isoformat()] for start, end in intervals]}
+                for uid, intervals in busy.items()
+            ],
+        })
+    return {"group_id": group_id, "member_ids": member_ids, "days": days}
 
-        busy_intervals: list[tuple[datetime, datetime]] = []
-        for ev in events:
-            if ev.date != current_day:
-                continue
-            ev_start = datetime.combine(ev.date, ev.start_time) if ev.start_time else day_start
-            ev_end = datetime.combine(ev.date, ev.end_time) if ev.end_time else day_end
-            if ev_end <= day_start or ev_start >= day_end:
-                continue
-            if ev_start < day_start:
-                ev_start = day_start
-            if ev_end > day_end:
-                ev_end = day_end
-            if ev_end > ev_start:
-                busy_intervals.append((ev_start, ev_end))
-
-        merged = _merge_intervals(busy_intervals)
-        cursor = day_start
-        for start, end in merged:
-            if start - cursor >= slot_length:
-                slot_end = cursor + slot_length
-                results.append({
-                    "date": current_day.isoformat(),
-                    "start": cursor.isoformat(),
-                    "end": slot_end.isoformat(),
-                    "duration_minutes": min_minutes,
-                    "label": _format_slot_label(cursor, slot_end),
-                })
-                if len(results) >= max_results:
-                    break
-            if end > cursor:
-                cursor = end
-        if len(results) >= max_results:
-            break
-        if day_end - cursor >= slot_length:
-            slot_end = cursor + slot_length
-            results.append({
-                "date": current_day.isoformat(),
-                "start": cursor.isoformat(),
-                "end": slot_end.isoformat(),
-                "duration_minutes": min_minutes,
-                "label": _format_slot_label(cursor, slot_end),
-            })
-            if len(results) >= max_results:
-                break
 
-    first = results[0] if results else None
-    if first:
-        if min_minutes % 60 == 0:
-            duration_label = f"{min_minutes // 60}ч"
-        else:
-            duration_label = f"{min_minutes} мин"
-        summary = f'Ближайшее общее окно для “{group.name}”: {first["label"]} ({duration_label})'
-    else:
-        summary = f'В ближайшие {days_ahead} дней не найдено общего окна на {min_minutes} мин. Попробуйте уменьшить длительность.'
+HEATMAP_SLOT_MINUTES = (15, 30, 60)
+
+
+@app.get("/api/groups/{group_id}/availability-heatmap")
+def get_group_availability_heatmap(
+    group_id: int,
+    days_ahead: int = Query(default=14, ge=1, le=60),
+    slot_minutes: int = Query(default=30),
+    from_hour: int = Query(default=9, ge=0, le=23),
+    to_hour: int = Query(default=22, ge=1, le=24),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if slot_minutes not in HEATMAP_SLOT_MINUTES:
+        raise HTTPException(status_code=400, detail="slot_minutes должен быть 15, 30 или 60")
+    if to_hour <= from_hour:
+        raise HTTPException(status_code=400, detail="to_hour должен быть больше from_hour")
+    if freebusy_np is None:
+        raise HTTPException(status_code=503, detail="Тепловая карта недоступна: не установлен NumPy")
+    membership = db.query(models.GroupMember).filter_by(group_id=group_id, user_id=current_user.id).first()
+    if not membership:
+        raise HTTPException(status_code=404, detail="Группа не найдена или вы не состоите в ней")
+    member_ids = [row[0] for row in db.query(models.GroupMember.user_id).filter(models.GroupMember.group_id == group_id).all()]
 
+    today = dt_date.today()
+    free_busy = FreeBusy.load(db, group_id, member_ids, today, today + timedelta(days=days_ahead))
+    counts = free_busy.free_counts(from_hour, to_hour, slot_minutes)
+    slot_starts = range(from_hour * 60, to_hour * 60 - slot_minutes + 1, slot_minutes)
     return {
-        "group_id": group.id,
-        "group_name": group.name,
+        "group_id": group_id,
         "member_count": len(member_ids),
-        "member_names": member_names,
-        "min_minutes": min_minutes,
-        "days_ahead": days_ahead,
-        "window": first,
-        "alternatives": results[1:],
-        "summary": summary,
+        "slot_minutes": slot_minutes,
+        "from_hour": from_hour,
+        "to_hour": to_hour,
+        "slots": [f"{minute // 60:02d}:{minute % 60:02d}" for minute in slot_starts],
+        "days": [
+            {"date": current_day.isoformat(), "free_counts": row.tolist()}
+            for current_day, row in zip(free_busy.days(), counts)
+        ],
     }
 
 
+PROPOSAL_STATUS_FILTERS = {"open", "closed", "all"}
+
+
+def _encode_proposal_cursor(row) -> str:
+    # Same date|time|id layout as the event cursor, so _decode_event_cursor reads it back.
+    return f"{str(row.date)[:10]}|{str(row.start_time)}|{row.id}"
+
+
 @app.get("/api/groups/{group_id}/meeting-proposals")
 def get_group_meeting_proposals(
     group_id: int,
+    request: Request,
+    response: Response,
     limit: int = Query(default=10, ge=1, le=50),
+    cursor: Optional[str] = Query(default=None),
+    status_filter: str = Query(default="open", alias="status"),
+    date_from: Optional[dt_date] = Query(default=None, alias="from"),
+    date_to: Optional[dt_date] = Query(default=None, alias="to"),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    _cleanup_orphan_meeting_proposals(db)
-    _proposal_membership_or_404(group_id, current_user, db)
-    rows = db.execute(text("""
+    if status_filter not in PROPOSAL_STATUS_FILTERS:
+        raise HTTPException(status_code=400, detail="Статус должен быть open, closed или all")
+    if date_from and date_to and date_to <= date_from:
+        raise HTTPException(status_code=400, detail="Конец диапазона должен быть позже начала")
+    versions = _group_versions(db, current_user.id, group_id)
+    if not versions:
+        raise HTTPException(status_code=404, detail="Группа не найдена или вы не состоите в ней")
+    etag = _weak_etag("meeting-proposals", current_user.id, limit, cursor, status_filter, date_from, date_to, versions)
+    cached = _not_modified(request, etag)
+    if cached:
+        return cached
+    _set_etag(response, etag)
+
+    # Keyset pagination: status=open walks idx_meeting_proposals_group_status_date, closed and
+    # all walk idx_meeting_proposals_group_date with status as a residual filter. Either way a
+    # page is a range read in index order, with no sort over the group's whole history.
+    conditions = ["mp.group_id = :group_id"]
+    params = {"group_id": group_id, "limit": limit + 1}
+    if status_filter == "open":
+        conditions.append("mp.status = 'open'")
+    elif status_filter == "closed":
+        conditions.append("mp.status != 'open'")
+    if date_from:
+        conditions.append("mp.date >= :date_from")
+        params["date_from"] = date_from.isoformat()
+    if date_to:
+        conditions.append("mp.date < :date_to")
+        params["date_to"] = date_to.isoformat()
+    if cursor:
+        after_date, after_time, after_id = _decode_event_cursor(cursor)
+        conditions.append("(mp.date, mp.start_time, mp.id) > (:after_date, :after_time, :after_id)")
+        params.update({"after_date": after_date.isoformat(), "after_time": after_time, "after_id": after_id})
+    rows = db.execute(text(f"""
         SELECT mp.*,
                u.username AS creator_login,
                COALESCE(u.full_name, u.username) AS creator_name
         FROM meeting_proposals mp
         JOIN users u ON u.id = mp.creator_id
-        WHERE mp.group_id = :group_id
-          AND COALESCE(mp.status, 'open') = 'open'
+        WHERE {' AND '.join(conditions)}
           AND (
-                mp.shadow_event_id IS NULL
+                mp.status != 'open'
+                OR mp.shadow_event_id IS NULL
                 OR EXISTS (SELECT 1 FROM events e WHERE e.id = mp.shadow_event_id)
           )
-        ORDER BY mp.date ASC, mp.start_time ASC, mp.id DESC
+        ORDER BY mp.date ASC, mp.start_time ASC, mp.id ASC
         LIMIT :limit
-    """), {"group_id": group_id, "limit": limit}).fetchall()
-    return [_serialize_proposal_row(row, current_user.id, db) for row in rows]
+    """), params).fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_proposal_cursor(rows[-1])
+    return _serialize_proposal_rows(rows, current_user.id, db)
 
 
 @app.post("/api/meeting-proposals")
 def create_meeting_proposal(payload: dict, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    _cleanup_orphan_meeting_proposals(db)
     group_id = int(payload.get("group_id") or 0)
     title = str(payload.get("title") or "").strip()
     description = str(payload.get("description") or "").strip()
@@ -1189,19 +2776,24 @@ def create_meeting_proposal(payload: dict, current_user: models.User = Depends(g
         end_time=parsed_end,
         user_id=current_user.id,
         group_id=group_id,
+        kind=EVENT_KIND_PROPOSAL_SHADOW,
+        proposal_id=proposal_id,
     )
     db.add(shadow_event)
     db.flush()
+    _refresh_event_busy(db, _event_busy_key(shadow_event))
     db.execute(text("UPDATE meeting_proposals SET shadow_event_id=:event_id WHERE id=:proposal_id"), {"event_id": shadow_event.id, "proposal_id": proposal_id})
     db.execute(text("""
         INSERT INTO meeting_proposal_votes (proposal_id, user_id, vote)
         VALUES (:proposal_id, :user_id, 'yes')
     """), {"proposal_id": proposal_id, "user_id": current_user.id})
-    db.commit()
+    _recompute_proposal_tallies(db, [proposal_id])
+    _record_change(db, group_id, "proposal", proposal_id, action="created")
     member_ids = [row[0] for row in db.query(models.GroupMember.user_id).filter(models.GroupMember.group_id == group_id, models.GroupMember.user_id != current_user.id).all()]
     if member_ids:
         group = db.query(models.Group).filter_by(id=group_id).first()
-        _send_push_to_users_async(member_ids, f"Новый сбор в группе «{group.name if group else 'OpenTime'}»", f"{current_user.full_name or current_user.username}: {title} · {parsed_date.strftime('%d.%m')} {parsed_start.strftime('%H:%M')}–{parsed_end.strftime('%H:%M')}", "/", "opentime-proposal")
+        _enqueue_group_push(db, member_ids, group_id, "proposal", f"Новый сбор в группе «{group.name if group else 'OpenTime'}»", f"{current_user.full_name or current_user.username}: {title} · {parsed_date.strftime('%d.%m')} {parsed_start.strftime('%H:%M')}–{parsed_end.strftime('%H:%M')}")
+    db.commit()
 
     created = db.execute(text("""
         SELECT mp.*,
@@ -1216,7 +2808,6 @@ def create_meeting_proposal(payload: dict, current_user: models.User = Depends(g
 
 @app.get("/api/meeting-proposals/{proposal_id}")
 def get_meeting_proposal(proposal_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    _cleanup_orphan_meeting_proposals(db)
     row = db.execute(text("""
         SELECT mp.*,
                u.username AS creator_login,
@@ -1233,7 +2824,6 @@ def get_meeting_proposal(proposal_id: int, current_user: models.User = Depends(g
 
 @app.post("/api/meeting-proposals/{proposal_id}/vote")
 def vote_for_meeting_proposal(proposal_id: int, payload: dict, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    _cleanup_orphan_meeting_proposals(db)
     vote = str(payload.get("vote") or "").strip().lower()
     if vote not in {"yes", "no", "maybe"}:
         raise HTTPException(status_code=400, detail="Голос должен быть yes, no или maybe")
@@ -1249,6 +2839,8 @@ def vote_for_meeting_proposal(proposal_id: int, payload: dict, current_user: mod
     if not row:
         raise HTTPException(status_code=404, detail="Предложение встречи не найдено")
     _proposal_membership_or_404(row.group_id, current_user, db)
+    if row.status != "open":
+        raise HTTPException(status_code=400, detail="Сбор уже закрыт")
 
     db.execute(text("""
         INSERT INTO meeting_proposal_votes (proposal_id, user_id, vote, created_at, updated_at)
@@ -1256,6 +2848,8 @@ def vote_for_meeting_proposal(proposal_id: int, payload: dict, current_user: mod
         ON CONFLICT(proposal_id, user_id)
         DO UPDATE SET vote=excluded.vote, updated_at=CURRENT_TIMESTAMP
     """), {"proposal_id": proposal_id, "user_id": current_user.id, "vote": vote})
+    _recompute_proposal_tallies(db, [proposal_id])
+    _record_change(db, row.group_id, "proposal", proposal_id, action="voted")
     db.commit()
 
     fresh = db.execute(text("""
@@ -1272,14 +2866,13 @@ def vote_for_meeting_proposal(proposal_id: int, payload: dict, current_user: mod
 
 @app.put("/api/meeting-proposals/{proposal_id}")
 def update_meeting_proposal(proposal_id: int, payload: dict, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    _cleanup_orphan_meeting_proposals(db)
     row = db.execute(text("""
         SELECT mp.*,
                u.username AS creator_login,
                COALESCE(u.full_name, u.username) AS creator_name
         FROM meeting_proposals mp
         JOIN users u ON u.id = mp.creator_id
-        WHERE mp.id = :proposal_id AND COALESCE(mp.status, 'open') = 'open'
+        WHERE mp.id = :proposal_id AND mp.status = 'open'
     """), {"proposal_id": proposal_id}).fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Предложение встречи не найдено")
@@ -1316,11 +2909,15 @@ def update_meeting_proposal(proposal_id: int, payload: dict, current_user: model
     if row.shadow_event_id:
         shadow = db.query(models.Event).filter_by(id=row.shadow_event_id).first()
         if shadow:
+            previous_busy_key = _event_busy_key(shadow)
             shadow.title = f"🗳️ {title}"
             shadow.description = f"[proposal:{proposal_id}]\n{description}" if description else f"[proposal:{proposal_id}]"
             shadow.date = parsed_date
             shadow.start_time = parsed_start
             shadow.end_time = parsed_end
+            shadow.version = (shadow.version or 1) + 1
+            _refresh_event_busy(db, previous_busy_key, _event_busy_key(shadow))
+    _record_change(db, row.group_id, "proposal", proposal_id)
     db.commit()
     fresh = db.execute(text("""
         SELECT mp.*,
@@ -1335,25 +2932,76 @@ def update_meeting_proposal(proposal_id: int, payload: dict, current_user: model
 
 @app.delete("/api/meeting-proposals/{proposal_id}")
 def delete_meeting_proposal(proposal_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    _cleanup_orphan_meeting_proposals(db)
-    row = db.execute(text("SELECT id, creator_id, shadow_event_id FROM meeting_proposals WHERE id = :proposal_id AND COALESCE(status, 'open') = 'open'"), {"proposal_id": proposal_id}).fetchone()
+    row = db.execute(text("SELECT id, group_id, creator_id, shadow_event_id FROM meeting_proposals WHERE id = :proposal_id AND status = 'open'"), {"proposal_id": proposal_id}).fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Предложение встречи не найдено")
     if row.creator_id != current_user.id:
         raise HTTPException(status_code=403, detail="Удалить можно только своё предложение встречи")
     db.execute(text("DELETE FROM meeting_proposal_votes WHERE proposal_id = :proposal_id"), {"proposal_id": proposal_id})
     db.execute(text("DELETE FROM meeting_proposals WHERE id = :proposal_id"), {"proposal_id": proposal_id})
+    _record_change(db, row.group_id, "proposal", proposal_id, "delete")
     if row.shadow_event_id:
         shadow = db.query(models.Event).filter_by(id=row.shadow_event_id).first()
         if shadow:
+            _record_change(db, shadow.group_id, "event", shadow.id, "delete")
             db.delete(shadow)
+            _refresh_event_busy(db, _event_busy_key(shadow))
     db.commit()
     return {"detail": "Предложение встречи удалено"}
 
 
+@app.get("/api/notifications/summary")
+def get_notifications_summary(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Open-proposal totals and unseen counts for every group of the user in one aggregate query.
+
+    A proposal is unseen when someone else created it after the member's proposals_seen_at marker.
+    """
+    rows = db.execute(text("""
+        SELECT gm.group_id,
+               g.name,
+               gm.proposals_seen_at,
+               COUNT(mp.id) AS total,
+               COUNT(CASE WHEN mp.creator_id != :user_id
+                           AND (gm.proposals_seen_at IS NULL OR mp.created_at > gm.proposals_seen_at)
+                          THEN 1 END) AS unseen
+        FROM group_members gm
+        JOIN groups g ON g.id = gm.group_id
+        LEFT JOIN meeting_proposals mp
+            ON mp.group_id = gm.group_id AND mp.status = 'open'
+        WHERE gm.user_id = :user_id
+          AND substr(g.name, 1, length(:personal_prefix)) != :personal_prefix
+        GROUP BY gm.group_id, g.name, gm.proposals_seen_at
+        ORDER BY gm.group_id
+    """), {"user_id": current_user.id, "personal_prefix": PERSONAL_GROUP_PREFIX}).fetchall()
+    groups = [
+        {
+            "group_id": row.group_id,
+            "name": row.name,
+            "total": row.total,
+            "unseen": row.unseen,
+            "seen_at": str(row.proposals_seen_at) if row.proposals_seen_at else None,
+        }
+        for row in rows
+    ]
+    return {"total_unseen": sum(item["unseen"] for item in groups), "groups": groups}
+
+
+@app.post("/api/notifications/seen")
+def mark_group_proposals_seen(payload: dict, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    group_id = int(payload.get("group_id") or 0)
+    updated = db.execute(text("""
+        UPDATE group_members SET proposals_seen_at = CURRENT_TIMESTAMP
+        WHERE user_id = :user_id AND group_id = :group_id
+    """), {"user_id": current_user.id, "group_id": group_id})
+    if not updated.rowcount:
+        raise HTTPException(status_code=404, detail="Группа не найдена или вы не состоите в ней")
+    db.commit()
+    return {"detail": "Отмечено как просмотренное", "group_id": group_id}
+
+
 @app.get("/api/health")
 def health_check():
-    return {"status": "healthy", "database": "SQLite"}
+    return {"status": "healthy", "database": "SQLite", "month_cache": month_cache.stats(), "auth_cache": principal_cache.stats(), "hash_pool": hash_pool.stats(), "push": push_sender.stats(), "email": {**_email_outbox_depth(), **mailer.stats()}, "stream": change_hub.stats()}
 
 
 BASE_DIR = Path(__file__).resolve().parent
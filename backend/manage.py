@@ -0,0 +1,70 @@
+import argparse
+
+import main
+from database import SessionLocal
+from freebusy import rebuild_busy_index
+
+
+def rebuild_busy(_args):
+    db = SessionLocal()
+    try:
+        written = rebuild_busy_index(db)
+    finally:
+        db.close()
+    print(f'busy_index: {written} rows rebuilt')
+
+
+def sweep_proposals(_args):
+    db = SessionLocal()
+    try:
+        removed = main._sweep_orphan_meeting_proposals(db)
+    finally:
+        db.close()
+    print(f'meeting_proposals: {removed} orphan proposals removed')
+
+
+def finalize_proposals(_args):
+    db = SessionLocal()
+    try:
+        closed = main._finalize_meeting_proposals(db)
+    finally:
+        db.close()
+    print('meeting_proposals: ' + ', '.join(f'{count} {outcome}' for outcome, count in closed.items()))
+
+
+def check_tallies(args):
+    db = SessionLocal()
+    try:
+        drift = main._proposal_tally_drift(db)
+        for item in drift:
+            print(f"proposal {item['proposal_id']} (group {item['group_id']}): stored {item['stored']} != actual {item['actual']}")
+        if drift and args.fix:
+            main._recompute_proposal_tallies(db, [item['proposal_id'] for item in drift])
+            db.commit()
+    finally:
+        db.close()
+    status = 'fixed' if drift and args.fix else 'drifted'
+    print(f'meeting_proposals: {len(drift)} proposals {status}')
+
+
+COMMANDS = {
+    'rebuild-busy-index': (rebuild_busy, 'Пересобрать индекс занятости из таблицы events'),
+    'sweep-proposals': (sweep_proposals, 'Удалить предложения встреч без теневого события'),
+    'finalize-proposals': (finalize_proposals, 'Закрыть сборы, которые набрали кворум или уже прошли'),
+    'check-tallies': (check_tallies, 'Пересчитать итоги голосований и показать расхождения'),
+}
+
+
+def run():
+    parser = argparse.ArgumentParser(description='OpenTime maintenance commands')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub.add_parser(name, help=help_text)
+    sub.choices['check-tallies'].add_argument('--fix', action='store_true', help='Записать пересчитанные итоги')
+    args = parser.parse_args()
+    main._startup_migrations()
+    COMMANDS[args.command][0](args)
+
+
+if __name__ == '__main__':
+    run()
@@ -33,6 +33,7 @@ class Group(Base):
     invite_code = Column(String, unique=True, index=True, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, nullable=True, default=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
 
     members = relationship("GroupMember", back_populates="group", cascade="all, delete-orphan")
     events = relationship("Event", back_populates="group", cascade="all, delete-orphan")
@@ -44,6 +45,7 @@ class GroupMember(Base):
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
     group_id = Column(Integer, ForeignKey("groups.id"), primary_key=True)
     color = Column(String, nullable=True, default="#007AFF")
+    proposals_seen_at = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="memberships")
     group = relationship("Group", back_populates="members")
@@ -61,6 +63,12 @@ class Event(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
     created_at = Column(DateTime, nullable=True, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+    # regular | legacy_proposal | proposal_shadow; proposal_id points at meeting_proposals.id for shadows.
+    # No ForeignKey: meeting_proposals has no ORM model and is created by a startup migration.
+    kind = Column(String, nullable=False, default="regular", server_default="regular")
+    proposal_id = Column(Integer, nullable=True)
 
     user = relationship("User", back_populates="events")
     group = relationship("Group", back_populates="events")
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+try:
+    import requests
+    from py_vapid import Vapid
+    from pywebpush import WebPusher, WebPushException
+except Exception:
+    requests = None
+    Vapid = None
+    WebPusher = None
+    WebPushException = Exception
+
+
+# pywebpush's own default lifetime for a VAPID JWT; headers are re-signed this long
+# before they expire so a request never goes out with a token about to lapse.
+VAPID_TOKEN_SECONDS = 12 * 60 * 60
+VAPID_REFRESH_MARGIN_SECONDS = 10 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def _load_vapid(private_key: str):
+    # Same rules as pywebpush.webpush(): a path to a PEM file, otherwise the key itself.
+    if os.path.isfile(private_key):
+        return Vapid.from_file(private_key_file=private_key)
+    return Vapid.from_string(private_key=private_key)
+
+
+class PushSender:
+    """Web push delivery with per-origin VAPID headers and HTTP connections.
+
+    The VAPID JWT only depends on the push service origin (its `aud`), so it is signed
+    once per origin and reused until shortly before `exp`; each subscription then costs
+    one payload encryption and one POST over a pooled keep-alive connection.
+    """
+
+    def __init__(self, private_key: str, subject: str, pool_size: int = 8):
+        self.available = WebPusher is not None and bool(private_key)
+        self.subject = subject
+        self.pool_size = max(1, pool_size)
+        self._vapid = None
+        if self.available:
+            # A bad key only disables push; it must not stop the API from importing.
+            try:
+                self._vapid = _load_vapid(private_key)
+            except Exception:
+                logger.exception("VAPID private key could not be loaded; web push is disabled")
+                self.available = False
+        self._headers: dict[str, tuple[float, dict]] = {}
+        self._sessions: dict[str, "requests.Session"] = {}
+        self._lock = threading.Lock()
+        self._metrics = {"signed": 0, "sign_seconds": 0.0, "encrypted": 0, "encrypt_seconds": 0.0, "sent": 0}
+
+    def send(self, subscription_info: dict, data: str, ttl: int = 0, timeout: Optional[float] = None):
+        """POST one encrypted message; raises WebPushException for any non-2xx answer."""
+        url = urlparse(subscription_info["endpoint"])
+        origin = f"{url.scheme}://{url.netloc}"
+        session = self._session(origin)
+        pusher = WebPusher(subscription_info, requests_session=session)
+        started = time.perf_counter()
+        encoded = pusher.encode(data, "aes128gcm")
+        self._count("encrypted", "encrypt_seconds", time.perf_counter() - started)
+        headers = dict(self._vapid_headers(origin))
+        headers.update({"content-encoding": "aes128gcm", "ttl": str(ttl)})
+        response = session.post(subscription_info["endpoint"], data=encoded["body"], headers=headers, timeout=timeout)
+        with self._lock:
+            self._metrics["sent"] += 1
+        if response.status_code > 202:
+            raise WebPushException(f"Push failed: {response.status_code} {response.reason}", response=response)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            origins = len(self._headers)
+        return {
+            "sent": metrics["sent"],
+            "origins": origins,
+            "signed": metrics["signed"],
+            "sign_ms": round(metrics["sign_seconds"] * 1000, 1),
+            "encrypted": metrics["encrypted"],
+            "encrypt_ms": round(metrics["encrypt_seconds"] * 1000, 1),
+        }
+
+    def _vapid_headers(self, origin: str) -> dict:
+        now = time.time()
+        with self._lock:
+            cached = self._headers.get(origin)
+        if cached and cached[0] - VAPID_REFRESH_MARGIN_SECONDS > now:
+            return cached[1]
+        expires = int(now) + VAPID_TOKEN_SECONDS
+        started = time.perf_counter()
+        headers = self._vapid.sign({"sub": self.subject, "aud": origin, "exp": expires})
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._headers[origin] = (expires, headers)
+            self._metrics["signed"] += 1
+            self._metrics["sign_seconds"] += elapsed
+        return headers
+
+    def _session(self, origin: str):
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount(origin, adapter)
+                self._sessions[origin] = session
+            return session
+
+    def _count(self, counter: str, timer: str, elapsed: float) -> None:
+        with self._lock:
+            self._metrics[counter] += 1
+            self._metrics[timer] += elapsed
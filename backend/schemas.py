@@ -102,12 +102,19 @@ class EventResponse(EventBase):
     creator_name: Optional[str] = None
     creator_avatar: Optional[str] = None
     color: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    version: int = 1
 
     class Config:
         orm_mode = True
         from_attributes = True
 
 
+class EventRangeResponse(BaseModel):
+    items: List[EventResponse]
+    next_cursor: Optional[str] = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
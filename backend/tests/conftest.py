@@ -0,0 +1,31 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    # database.py opens ./calendar.db, so the app is imported from a scratch directory.
+    os.chdir(tmp_path_factory.mktemp("db"))
+    os.environ.setdefault("OPENTIME_HASH_WORKERS", "0")
+    # No push dispatcher thread; tests drive the outbox themselves.
+    os.environ.setdefault("OPENTIME_PUSH_WORKERS", "0")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def register(client, username: str) -> dict:
+    password = "secret123"
+    response = client.post("/api/register", json={"email": f"{username}@example.com", "username": username, "password": password})
+    assert response.status_code == 200, response.text
+    response = client.post("/api/token", data={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import event as sa_event
+
+from conftest import register
+
+
+@contextmanager
+def count_statements():
+    from database import engine
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa_event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def add_events(client, headers, group_id: int, count: int, start: int = 0) -> None:
+    for index in range(start, start + count):
+        day = date(2030, 1, 1) + timedelta(days=index % 28)
+        response = client.post("/api/events", json={"title": f"plan {index}", "date": day.isoformat(), "start_time": "10:00:00", "group_id": group_id}, headers=headers)
+        assert response.status_code == 200, response.text
+
+
+def feed_statements(client, headers, group_id: int) -> tuple[int, int]:
+    with count_statements() as statements:
+        response = client.get("/api/events", params={"group_id": group_id}, headers=headers)
+    assert response.status_code == 200, response.text
+    return len(response.json()), len(statements)
+
+
+def test_event_feed_statement_count_does_not_grow_with_events(client):
+    headers = register(client, "feedowner")
+    group = client.post("/api/groups", json={"name": "Feed"}, headers=headers).json()
+    proposal = client.post("/api/meeting-proposals", json={"group_id": group["id"], "title": "vote", "date": "2030-01-05", "start_time": "12:00", "end_time": "13:00"}, headers=headers)
+    assert proposal.status_code == 200, proposal.text
+
+    add_events(client, headers, group["id"], 3)
+    feed_statements(client, headers, group["id"])  # warms the principal cache
+    small_rows, small_statements = feed_statements(client, headers, group["id"])
+
+    add_events(client, headers, group["id"], 40, start=3)
+    large_rows, large_statements = feed_statements(client, headers, group["id"])
+
+    # The open proposal's shadow event is left out of the feed by the query itself.
+    assert (small_rows, large_rows) == (3, 43)
+    assert small_statements == large_statements
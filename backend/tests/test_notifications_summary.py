@@ -0,0 +1,13 @@
+from conftest import register
+
+
+def test_summary_hides_only_the_personal_group(client):
+    headers = register(client, "summaryowner")
+    # Matches '__personal__:%' if '_' is treated as a LIKE wildcard.
+    lookalike = client.post("/api/groups", json={"name": "xxpersonalxx:trip"}, headers=headers).json()
+    client.get("/api/events", headers=headers)  # creates the personal group
+
+    response = client.get("/api/notifications/summary", headers=headers)
+    assert response.status_code == 200, response.text
+    names = [group["name"] for group in response.json()["groups"]]
+    assert names == [lookalike["name"]]
@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event as sa_event, text
+
+from conftest import register
+
+
+def walk(client, headers, group_id: int, status: str) -> list[int]:
+    ids, cursor = [], None
+    while True:
+        params = {"status": status, "limit": 7}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/groups/{group_id}/meeting-proposals", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        ids += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+
+def test_proposal_pages_follow_the_index_for_every_status(client):
+    from database import engine
+
+    headers = register(client, "pagingowner")
+    group = client.post("/api/groups", json={"name": "Paging"}, headers=headers).json()
+    with engine.begin() as conn:
+        for index in range(60):
+            conn.execute(text("""
+                INSERT INTO meeting_proposals (group_id, creator_id, title, date, start_time, end_time, status)
+                SELECT :group_id, id, 'past', :date, :start_time, '23:00', :status FROM users WHERE username = 'pagingowner'
+            """), {
+                "group_id": group["id"],
+                "date": (date(2020, 1, 1) + timedelta(days=index // 3)).isoformat(),
+                "start_time": f"{10 + index % 3}:00",
+                "status": "open" if index % 4 == 0 else "closed",
+            })
+        rows = conn.execute(text("SELECT id, status FROM meeting_proposals WHERE group_id = :group_id ORDER BY date, start_time, id"), {"group_id": group["id"]}).fetchall()
+
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if "FROM meeting_proposals mp" in statement and "LIMIT" in statement:
+            plans.append(" ".join(row[3] for row in cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)))
+
+    sa_event.listen(engine, "before_cursor_execute", explain)
+    try:
+        assert walk(client, headers, group["id"], "open") == [row.id for row in rows if row.status == "open"]
+        assert walk(client, headers, group["id"], "closed") == [row.id for row in rows if row.status != "open"]
+        assert walk(client, headers, group["id"], "all") == [row.id for row in rows]
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", explain)
+
+    assert plans
+    for plan in plans:
+        assert "TEMP B-TREE" not in plan, plan
+        assert "idx_meeting_proposals_group_" in plan, plan
@@ -0,0 +1,151 @@
+import base64
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from sqlalchemy import text
+
+from conftest import register
+
+
+class PushService(BaseHTTPRequestHandler):
+    """/ok/* accepts, /gone/* answers 410, /flaky/* fails twice with 500 and then accepts."""
+
+    hits = Counter()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        PushService.hits[self.path] += 1
+        code = 201
+        if self.path.startswith("/gone"):
+            code = 410
+        elif self.path.startswith("/flaky") and PushService.hits[self.path] <= 2:
+            code = 500
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def push_service():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PushService)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    PushService.hits.clear()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def subscription_keys() -> tuple[str, str]:
+    public_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    encode = lambda raw: base64.urlsafe_b64encode(raw).decode().rstrip("=")
+    return encode(public_key), encode(os.urandom(16))
+
+
+def outbox(engine) -> dict:
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT o.id, o.attempts, o.next_attempt_at, s.endpoint FROM push_outbox o JOIN push_subscriptions s ON s.id = o.subscription_id")).fetchall()
+    return {row.endpoint.rsplit("/", 2)[-2]: row for row in rows}
+
+
+def as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def run_pass(main) -> int:
+    token, batch = main._claim_push_batch()
+    main._settle_push_batch(token, [(row, main._deliver_push(row)) for row in batch])
+    return len(batch)
+
+
+def make_due(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE push_outbox SET next_attempt_at = :now"), {"now": datetime.utcnow() - timedelta(seconds=1)})
+
+
+def test_push_outbox_retries_with_backoff_and_drops_gone_endpoints(client, push_service):
+    import main
+    from database import SessionLocal, engine
+
+    kinds = ("ok", "gone", "flaky")
+    user_ids = [client.get("/api/users/me", headers=register(client, f"push{kind}")).json()["id"] for kind in kinds]
+    with engine.begin() as conn:
+        for kind, user_id in zip(kinds, user_ids):
+            p256dh, auth = subscription_keys()
+            conn.execute(text("INSERT INTO push_subscriptions (user_id, endpoint, p256dh, auth) VALUES (:user_id, :endpoint, :p256dh, :auth)"),
+                         {"user_id": user_id, "endpoint": f"{push_service}/{kind}/{user_id}", "p256dh": p256dh, "auth": auth})
+
+    db = SessionLocal()
+    try:
+        main._enqueue_push(db, user_ids, "title", "body")
+        db.commit()
+    finally:
+        db.close()
+    assert set(outbox(engine)) == {"ok", "gone", "flaky"}
+
+    started = datetime.utcnow()
+    assert run_pass(main) == 3
+    rows = outbox(engine)
+    # Delivered and gone rows are settled; 410 also removes the subscription.
+    assert set(rows) == {"flaky"}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM push_subscriptions WHERE endpoint LIKE '%/gone/%'")).scalar() == 0
+    first_delay = as_datetime(rows["flaky"].next_attempt_at) - started
+    assert rows["flaky"].attempts == 1
+    assert timedelta(seconds=main.PUSH_RETRY_BASE_SECONDS / 2 - 1) <= first_delay <= timedelta(seconds=main.PUSH_RETRY_BASE_SECONDS + 1)
+
+    # Not due yet: nothing is claimed.
+    assert run_pass(main) == 0
+
+    make_due(engine)
+    started = datetime.utcnow()
+    assert run_pass(main) == 1
+    row = outbox(engine)["flaky"]
+    second_delay = as_datetime(row.next_attempt_at) - started
+    assert row.attempts == 2
+    assert timedelta(seconds=main.PUSH_RETRY_BASE_SECONDS - 1) <= second_delay <= timedelta(seconds=main.PUSH_RETRY_BASE_SECONDS * 2 + 1)
+
+    make_due(engine)
+    assert run_pass(main) == 1
+    assert outbox(engine) == {}
+    assert PushService.hits[f"/ok/{user_ids[0]}"] == 1
+    assert PushService.hits[f"/flaky/{user_ids[2]}"] == 3
+
+
+def test_push_settle_leaves_rows_claimed_by_another_worker(client, push_service):
+    import main
+    from database import SessionLocal, engine
+
+    headers = register(client, "pushlease")
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    p256dh, auth = subscription_keys()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO push_subscriptions (user_id, endpoint, p256dh, auth) VALUES (:user_id, :endpoint, :p256dh, :auth)"),
+                     {"user_id": user_id, "endpoint": f"{push_service}/ok/{user_id}", "p256dh": p256dh, "auth": auth})
+    db = SessionLocal()
+    try:
+        main._enqueue_push(db, [user_id], "title", "body")
+        db.commit()
+    finally:
+        db.close()
+
+    token, batch = main._claim_push_batch()
+    assert len(batch) == 1
+    # The lease ran out and another worker re-claimed the row before this one settled.
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE push_outbox SET claimed_by = 'other-worker'"))
+    main._settle_push_batch(token, [(batch[0], "sent")])
+    main._settle_push_batch(token, [(batch[0], "retry")])
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT claimed_by, attempts FROM push_outbox WHERE id = :id"), {"id": batch[0].id}).one()
+        conn.execute(text("DELETE FROM push_outbox"))
+    assert (row.claimed_by, row.attempts) == ("other-worker", 0)
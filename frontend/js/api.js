@@ -152,6 +152,24 @@ export function getEvents(groupId, year, month){
   return apiFetch(`/events${q.toString() ? `?${q.toString()}` : ''}`);
 }
 
+export function getEventsRange(from, to, { groupIds = [], limit, cursor } = {}){
+  const q = new URLSearchParams({ from, to });
+  for(const id of groupIds) q.append('group_ids', id);
+  if(limit) q.set('limit', limit);
+  if(cursor) q.set('cursor', cursor);
+  return apiFetch(`/events/range?${q.toString()}`);
+}
+
 export function createEvent(payload){ return apiFetch('/events', { method:'POST', body: payload }); }
 export function updateEvent(eventId, payload){ return apiFetch(`/events/${eventId}`, { method:'PUT', body: payload }); }
-export function deleteEvent(eventId){ return apiFetch(`/events/${eventId}`, { method:'DELETE' }); }
\ No newline at end of file
+export function deleteEvent(eventId){ return apiFetch(`/events/${eventId}`, { method:'DELETE' }); }
+
+export function getBestWindowsBatch(groupIds, durations, params = {}){
+  const q = new URLSearchParams();
+  for(const id of groupIds) q.append('group_ids', id);
+  for(const minutes of durations) q.append('durations', minutes);
+  for(const [key, value] of Object.entries(params)){
+    if(value !== undefined && value !== null && value !== '') q.set(key, value);
+  }
+  return apiFetch(`/groups/best-window/batch?${q.toString()}`);
+}
@@ -218,12 +218,13 @@ function pad2(n){ return String(n).padStart(2,"0"); }
     const y = state.currentMonth.getFullYear();
     const m = state.currentMonth.getMonth() + 1;
     try{
-      const params = new URLSearchParams({ year: String(y), month: String(m), _: String(Date.now()) });
+      const params = new URLSearchParams({ year: String(y), month: String(m) });
       if(gid) params.set("group_id", String(gid));
       const url = `${API_ORIGIN}/api/events?${params.toString()}`;
+      // "no-cache" always revalidates: the browser sends If-None-Match and reuses the body on 304.
       const res = await fetch(url, {
-        headers: { ...authHeaders(), "Cache-Control": "no-cache" },
-        cache: "no-store"
+        headers: { ...authHeaders() },
+        cache: "no-cache"
       });
       if(res.ok) state.eventsCache = await res.json();
       else state.eventsCache = [];
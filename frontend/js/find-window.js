@@ -78,6 +78,11 @@ function getSelectedGroup(){
   return groupsCache.find(g => String(g.id) === String(selectedGroupId)) || null;
 }
 
+// The list endpoint returns only the vote summary; the roster is fetched per proposal on demand.
+function renderVoteChips(members){
+  return members.map(member => `<span class="vote-chip vote-${member.vote}">${escapeHtml(member.name)}: ${member.vote === 'yes' ? 'может' : member.vote === 'no' ? 'не может' : member.vote === 'maybe' ? 'может быть' : 'ждём ответ'}</span>`).join('');
+}
+
 function renderProposalList(list){
   const wrap = $("meetingProposalsList");
   if (!wrap) return;
@@ -100,7 +105,7 @@ function renderProposalList(list){
         ${item.description ? `<div class="proposal-desc">${escapeHtml(item.description)}</div>` : ''}
         <div class="proposal-stats">Смогут: ${item.summary.yes} · Не смогут: ${item.summary.no} · Без ответа: ${item.summary.pending}</div>
         <div class="proposal-votes">
-          ${item.members.map(member => `<span class="vote-chip vote-${member.vote}">${escapeHtml(member.name)}: ${member.vote === 'yes' ? 'может' : member.vote === 'no' ? 'не может' : member.vote === 'maybe' ? 'может быть' : 'ждём ответ'}</span>`).join('')}
+          <button class="mini-vote-btn" type="button" data-load-members>Кто ответил</button>
         </div>
         <div class="proposal-actions">
           <button class="mini-vote-btn ${canClass}" type="button" data-vote="yes">Я смогу</button>
@@ -110,6 +115,22 @@ function renderProposalList(list){
     `;
   }).join('');
 
+  wrap.querySelectorAll('[data-proposal-id] [data-load-members]').forEach(btn => {
+    btn.addEventListener('click', async () => {
+      const votes = btn.closest('.proposal-votes');
+      const proposalId = btn.closest('[data-proposal-id]')?.dataset.proposalId;
+      if (!votes || !proposalId) return;
+      btn.disabled = true;
+      try {
+        const item = await api(`/api/meeting-proposals/${proposalId}`);
+        votes.innerHTML = renderVoteChips(item.members || []);
+      } catch (err) {
+        btn.disabled = false;
+        console.warn(err.message || 'Не удалось загрузить участников');
+      }
+    });
+  });
+
   wrap.querySelectorAll('[data-proposal-id] [data-vote]').forEach(btn => {
     btn.addEventListener('click', async () => {
       const card = btn.closest('[data-proposal-id]');
@@ -191,10 +212,13 @@ async function openMeetingProposalEditor(proposalId){
 }
 
 async function openMeetingEventEditor(eventId){
-  const [year, month] = [(new Date()).getFullYear(), (new Date()).getMonth()+1];
+  const today = new Date();
+  const from = `${today.getFullYear()}-${String(today.getMonth()+1).padStart(2,'0')}-01`;
+  const next = new Date(today.getFullYear(), today.getMonth()+1, 1);
+  const to = `${next.getFullYear()}-${String(next.getMonth()+1).padStart(2,'0')}-01`;
   groupsCache = await api('/api/groups');
-  const rows = await api(`/api/events?year=${year}&month=${month}`);
-  const item = (rows || []).find(x => Number(x.id) === Number(eventId));
+  const page = await api(`/api/events/range?from=${from}&to=${to}`);
+  const item = (page?.items || []).find(x => Number(x.id) === Number(eventId));
   if (!item) throw new Error('Событие не найдено');
   editorMode = { type: 'edit-event', id: eventId, groupId: item.group_id };
   renderGroupSelect();
@@ -60,6 +60,14 @@ function ownerActions(type, item){
   </div>`;
 }
 
+// List endpoints return only the vote summary; the roster comes with the single proposal.
+function renderMemberPills(members){
+  return members.map(member => `<div class="proposal-member-pill proposal-member-pill--${member.vote || 'pending'}">
+        <span class="proposal-avatar">${userAvatar(member)}</span>
+        <span><span class="proposal-member-name">${escapeHtml(member.name)}</span><span class="proposal-member-state"> · ${escapeHtml(voteLabel(member.vote))}</span></span>
+      </div>`).join('');
+}
+
 function renderProposalCard(item, showCreator = true){
   const yesClass = item.current_user_vote === 'yes' ? 'is-active' : '';
   const noClass = item.current_user_vote === 'no' ? 'is-active' : '';
@@ -78,10 +86,7 @@ function renderProposalCard(item, showCreator = true){
       <span class="proposal-summary-chip proposal-summary-chip--pending">Без ответа · ${item.summary.pending}</span>
     </div>
     <div class="proposal-member-row">
-      ${(item.members || []).map(member => `<div class="proposal-member-pill proposal-member-pill--${member.vote || 'pending'}">
-        <span class="proposal-avatar">${userAvatar(member)}</span>
-        <span><span class="proposal-member-name">${escapeHtml(member.name)}</span><span class="proposal-member-state"> · ${escapeHtml(voteLabel(member.vote))}</span></span>
-      </div>`).join('')}
+      ${item.members ? renderMemberPills(item.members) : '<button class="proposal-detail-btn" type="button" data-load-members>Кто ответил</button>'}
     </div>
     <div class="proposal-actions-row">
       <button class="proposal-vote-btn proposal-vote-btn--yes ${yesClass}" type="button" data-vote="yes">Смогу</button>
@@ -108,7 +113,8 @@ function renderEventCard(item){
 async function ensureCurrentUser(){ if (!currentUser) currentUser = await api('/api/users/me'); return currentUser; }
 async function vote(proposalId, voteValue){ await api(`/api/meeting-proposals/${proposalId}/vote`, { method: 'POST', body: JSON.stringify({ vote: voteValue }) }); }
 async function fetchMonthEventsForDate(date){ const [year, month] = String(date).split('-').map(Number); if (!year || !month) return []; const rows = await api(`/api/events?year=${year}&month=${month}`); return (rows || []).filter(item => String(item.date) === String(date)); }
-async function fetchDayProposals(date){ const groups = await api('/api/groups'); const all = []; for (const group of groups || []){ try{ const rows = await api(`/api/groups/${group.id}/meeting-proposals?limit=30`); rows.filter(item => String(item.date) === String(date)).forEach(item => all.push(item)); }catch{} } return all; }
+function nextIsoDay(date){ const d = new Date(`${date}T00:00:00Z`); d.setUTCDate(d.getUTCDate() + 1); return d.toISOString().slice(0, 10); }
+async function fetchDayProposals(date){ const groups = await api('/api/groups'); const all = []; const range = `from=${encodeURIComponent(date)}&to=${nextIsoDay(date)}`; for (const group of groups || []){ try{ const rows = await api(`/api/groups/${group.id}/meeting-proposals?limit=50&${range}`); rows.forEach(item => all.push(item)); }catch{} } return all; }
 
 async function loadByProposalId(proposalId){ const title = $('proposalDetailsTitle'); const list = $('proposalDetailsList'); if (!list) return; await ensureCurrentUser(); title && (title.textContent = 'Детали встречи'); list.innerHTML = '<div class="color-hint">Загружаем...</div>'; openSheet(); try{ const item = await api(`/api/meeting-proposals/${proposalId}`); document.dispatchEvent(new CustomEvent('proposal:seen-group', { detail: { groupId: item.group_id } })); list.innerHTML = renderProposalCard(item); bindActions(); }catch(err){ list.innerHTML = `<div class="color-hint">${escapeHtml(err.message || 'Не удалось загрузить встречу')}</div>`; } }
 
@@ -131,6 +137,15 @@ function bindActions(){
       try{ await vote(proposalId, voteValue); await loadByProposalId(proposalId); document.dispatchEvent(new CustomEvent('meeting:updated')); }catch(err){ console.warn(err.message || 'Не удалось сохранить голос'); }
     });
   });
+  list.querySelectorAll('[data-proposal-id] [data-load-members]').forEach(btn => {
+    btn.addEventListener('click', async () => {
+      const row = btn.closest('.proposal-member-row');
+      const proposalId = Number(btn.closest('[data-proposal-id]')?.dataset.proposalId || 0);
+      if (!row || !proposalId) return;
+      btn.disabled = true;
+      try{ const item = await api(`/api/meeting-proposals/${proposalId}`); row.innerHTML = renderMemberPills(item.members || []); }catch(err){ btn.disabled = false; console.warn(err.message || 'Не удалось загрузить участников'); }
+    });
+  });
   list.querySelectorAll('[data-edit-proposal]').forEach(btn => btn.addEventListener('click', () => { closeSheet(); document.dispatchEvent(new CustomEvent('meeting:edit-proposal', { detail: { proposalId: Number(btn.dataset.editProposal) } })); }));
   list.querySelectorAll('[data-edit-event]').forEach(btn => btn.addEventListener('click', () => { closeSheet(); document.dispatchEvent(new CustomEvent('meeting:edit-event', { detail: { eventId: Number(btn.dataset.editEvent) } })); }));
   list.querySelectorAll('[data-delete-proposal]').forEach(btn => btn.addEventListener('click', async () => { const id = Number(btn.dataset.deleteProposal); if (!id) return; try{ await deleteProposal(id); closeSheet(); document.dispatchEvent(new CustomEvent('meeting:updated')); }catch(err){ console.warn(err.message || 'Не удалось удалить сбор'); } }));
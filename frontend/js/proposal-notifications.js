@@ -5,17 +5,21 @@ const KEYS = {
   freeDay: 'ot_notif_free_day',
   freeSlot: 'ot_notif_free_slot',
   proposal: 'ot_notif_group_proposals',
-  seen: 'ot_seen_group_proposals',
   feed: 'ot_notification_feed_v1',
   proposalKnown: 'ot_notification_known_proposals_v1',
   planKnown: 'ot_notification_known_plans_v1',
   feedViewedAt: 'ot_notification_feed_viewed_at_v1',
   initialized: 'ot_notification_bootstrap_done_v1',
+  syncCursor: 'ot_notification_sync_cursor_v1',
 };
 let currentUser = null;
 let activeGroupId = null;
 let lastSummary = { totalUnread: 0, byGroup: {}, totalsByGroup: {} };
 let pollTimer = null;
+let pollDebounce = null;
+let changeStream = null;
+let streamRetryTimer = null;
+let streamRetryDelay = 5000;
 let notificationsUiReady = false;
 
 function getToken(){
@@ -33,16 +37,16 @@ function getApiBase(){
   if (port === "5500") return `${protocol}//${hostname}:8080`;
   return "";
 }
-async function api(path){
+async function api(path, { method = 'GET', body } = {}){
   const token = getToken();
-  const res = await fetch(`${getApiBase()}${path}`, { headers: token ? { Authorization: `Bearer ${token}` } : {} });
+  const headers = token ? { Authorization: `Bearer ${token}` } : {};
+  if (body !== undefined) headers['Content-Type'] = 'application/json';
+  const res = await fetch(`${getApiBase()}${path}`, { method, headers, body: body !== undefined ? JSON.stringify(body) : undefined });
   if (!res.ok) throw new Error('Ошибка запроса');
   return res.json();
 }
 function readJson(key, fallback){ try{ return JSON.parse(localStorage.getItem(key) || JSON.stringify(fallback)); }catch{ return fallback; } }
 function writeJson(key, value){ localStorage.setItem(key, JSON.stringify(value)); }
-function getSeenMap(){ return readJson(KEYS.seen, {}); }
-function setSeenMap(value){ writeJson(KEYS.seen, value || {}); }
 function getKnownMap(key){ return readJson(key, {}); }
 function setKnownMap(key, value){ writeJson(key, value || {}); }
 function getFeed(){ return readJson(KEYS.feed, []); }
@@ -57,7 +61,13 @@ function browserNotificationsEnabled(){ return masterEnabled() && (plansEnabled(
 function ensureCheckbox(id, enabled){ const el=$(id); if (el) el.checked = !!enabled; }
 function updateSubtoggles(){ const wrap=$("notifSubWrap"); if (wrap) wrap.hidden = !masterEnabled(); }
 async function ensureCurrentUser(){ if (!currentUser) currentUser = await api('/api/users/me'); return currentUser; }
-function markGroupSeen(groupId){ if (!groupId) return; const seen = getSeenMap(); seen[String(groupId)] = Date.now(); setSeenMap(seen); applyBadges(lastSummary); }
+function markGroupSeen(groupId){
+  if (!groupId) return;
+  const totalUnread = Math.max(0, Number(lastSummary.totalUnread || 0) - Number(lastSummary.byGroup[String(groupId)] || 0));
+  lastSummary = { ...lastSummary, totalUnread, byGroup: { ...lastSummary.byGroup, [String(groupId)]: 0 } };
+  applyBadges(lastSummary);
+  api('/api/notifications/seen', { method: 'POST', body: { group_id: groupId } }).catch(() => {});
+}
 function getFriendsTab(){ return document.querySelector('.tab[data-tab="friends"]'); }
 function ensureDot(parent, className){
   if (!parent) return null;
@@ -95,25 +105,16 @@ function applyBadges(summary){
   renderNotificationFeed();
 }
 async function refreshBadges(){
+  // One aggregate request; unseen counts come from the server-side "last seen" markers.
   try{
-    await ensureCurrentUser();
-    const groups = await api('/api/groups');
-    const seen = getSeenMap();
+    const summary = await api('/api/notifications/summary');
     const byGroup = {};
     const totalsByGroup = {};
-    let totalUnread = 0;
-    for (const group of groups || []){
-      const rows = await api(`/api/groups/${group.id}/meeting-proposals?limit=30`);
-      totalsByGroup[String(group.id)] = (rows || []).length;
-      const unseen = (rows || []).filter(item => Number(item.creator_id) !== Number(currentUser.id)).filter(item => {
-        const created = Date.parse(item.created_at || '') || 0;
-        const seenAt = Number(seen[String(group.id)] || 0);
-        return created > seenAt;
-      });
-      byGroup[String(group.id)] = unseen.length;
-      totalUnread += unseen.length;
+    for (const item of summary?.groups || []){
+      byGroup[String(item.group_id)] = Number(item.unseen || 0);
+      totalsByGroup[String(item.group_id)] = Number(item.total || 0);
     }
-    lastSummary = { totalUnread, byGroup, totalsByGroup };
+    lastSummary = { totalUnread: Number(summary?.total_unseen || 0), byGroup, totalsByGroup };
   }catch{
     lastSummary = { totalUnread: 0, byGroup: {}, totalsByGroup: {} };
   }
@@ -173,8 +174,47 @@ function ensureFeedUi(){
   if (existing) existing.remove();
   notificationsUiReady = false;
 }
+function isoDate(d){ return `${d.getFullYear()}-${String(d.getMonth()+1).padStart(2,'0')}-${String(d.getDate()).padStart(2,'0')}`; }
+async function fetchWatchedEvents(){
+  // Current and next month across all groups in one request.
+  const today = new Date();
+  const from = new Date(today.getFullYear(), today.getMonth(), 1);
+  const to = new Date(today.getFullYear(), today.getMonth()+2, 1);
+  const items = [];
+  let cursor = '';
+  do {
+    const page = await api(`/api/events/range?from=${isoDate(from)}&to=${isoDate(to)}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`);
+    items.push(...(page?.items || []));
+    cursor = page?.next_cursor || '';
+  } while (cursor);
+  return items;
+}
+async function fetchChanges(){
+  // Delta since the stored cursor; without one, start from the server's current position.
+  const changes = { events: [], deletedEvents: [], proposals: [], deletedProposals: [] };
+  const saved = localStorage.getItem(KEYS.syncCursor);
+  if (saved === null){
+    const head = await api('/api/sync');
+    localStorage.setItem(KEYS.syncCursor, String(head?.cursor || 0));
+    return changes;
+  }
+  let cursor = Number(saved) || 0;
+  let page = null;
+  do {
+    page = await api(`/api/sync?since=${cursor}`);
+    changes.events.push(...(page?.events || []));
+    changes.deletedEvents.push(...(page?.deleted_events || []));
+    changes.proposals.push(...(page?.proposals || []));
+    changes.deletedProposals.push(...(page?.deleted_proposals || []));
+    cursor = Number(page?.cursor || cursor);
+  } while (page?.has_more);
+  localStorage.setItem(KEYS.syncCursor, String(cursor));
+  return changes;
+}
 async function bootstrapKnownItems(){
   await ensureCurrentUser();
+  const head = await api('/api/sync');
+  localStorage.setItem(KEYS.syncCursor, String(head?.cursor || 0));
   const groups = await api('/api/groups');
   const knownProposals = getKnownMap(KEYS.proposalKnown);
   const knownPlans = getKnownMap(KEYS.planKnown);
@@ -183,14 +223,7 @@ async function bootstrapKnownItems(){
     const proposals = await api(`/api/groups/${group.id}/meeting-proposals?limit=30`);
     for (const item of proposals || []) knownProposals[String(item.id)] = Date.parse(item.created_at || '') || now;
   }
-  const today = new Date();
-  const months = [[today.getFullYear(), today.getMonth()+1]];
-  const next = new Date(today.getFullYear(), today.getMonth()+1, 1);
-  months.push([next.getFullYear(), next.getMonth()+1]);
-  for (const [year, month] of months){
-    const rows = await api(`/api/events?year=${year}&month=${month}`);
-    for (const item of rows || []) if (Number(item.user_id) !== Number(currentUser.id)) knownPlans[String(item.id)] = Date.parse(item.created_at || '') || now;
-  }
+  for (const item of await fetchWatchedEvents()) if (Number(item.user_id) !== Number(currentUser.id)) knownPlans[String(item.id)] = Date.parse(item.created_at || '') || now;
   setKnownMap(KEYS.proposalKnown, knownProposals);
   setKnownMap(KEYS.planKnown, knownPlans);
   localStorage.setItem(KEYS.initialized, '1');
@@ -199,53 +232,50 @@ async function pollNotifications(){
   try{
     await ensureCurrentUser();
     if (localStorage.getItem(KEYS.initialized) !== '1') await bootstrapKnownItems();
-    const groups = await api('/api/groups');
+    const changes = await fetchChanges();
     const knownProposals = getKnownMap(KEYS.proposalKnown);
     const knownPlans = getKnownMap(KEYS.planKnown);
-    for (const group of groups || []){
-      const proposals = await api(`/api/groups/${group.id}/meeting-proposals?limit=30`);
-      for (const item of proposals || []){
-        const key = String(item.id);
-        const createdTs = Date.parse(item.created_at || '') || Date.now();
-        const isKnown = !!knownProposals[key];
-        knownProposals[key] = createdTs;
-        if (!isKnown && Number(item.creator_id) !== Number(currentUser.id) && proposalEnabled()){
-          addFeedItem({
-            type: 'proposal',
-            entityId: item.id,
-            groupId: group.id,
-            title: `Новый сбор в группе «${group.name}»`,
-            body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}${item.end_time ? '–' + String(item.end_time).slice(0,5) : ''}`,
-            meta: 'Откройте, чтобы посмотреть и проголосовать',
-            createdAtTs: createdTs,
-          });
-          showBrowserNotification(`Новый сбор · ${group.name}`, { body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}` });
-        }
+    const groupNames = {};
+    if (changes.proposals.length){
+      for (const group of await api('/api/groups') || []) groupNames[String(group.id)] = group.name;
+    }
+    for (const item of changes.proposals){
+      const key = String(item.id);
+      const createdTs = Date.parse(item.created_at || '') || Date.now();
+      const isKnown = !!knownProposals[key];
+      const groupName = groupNames[String(item.group_id)] || '';
+      knownProposals[key] = createdTs;
+      if (!isKnown && Number(item.creator_id) !== Number(currentUser.id) && proposalEnabled()){
+        addFeedItem({
+          type: 'proposal',
+          entityId: item.id,
+          groupId: item.group_id,
+          title: `Новый сбор в группе «${groupName}»`,
+          body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}${item.end_time ? '–' + String(item.end_time).slice(0,5) : ''}`,
+          meta: 'Откройте, чтобы посмотреть и проголосовать',
+          createdAtTs: createdTs,
+        });
+        showBrowserNotification(`Новый сбор · ${groupName}`, { body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}` });
       }
     }
-    const today = new Date();
-    const months = [[today.getFullYear(), today.getMonth()+1]];
-    const next = new Date(today.getFullYear(), today.getMonth()+1, 1);
-    months.push([next.getFullYear(), next.getMonth()+1]);
-    for (const [year, month] of months){
-      const rows = await api(`/api/events?year=${year}&month=${month}`);
-      for (const item of rows || []){
-        const key = String(item.id);
-        const createdTs = Date.parse(item.created_at || '') || Date.now();
-        const isKnown = !!knownPlans[key];
-        knownPlans[key] = createdTs;
-        if (!isKnown && Number(item.user_id) !== Number(currentUser.id) && plansEnabled()){
-          addFeedItem({
-            type: 'plan',
-            entityId: item.id,
-            groupId: item.group_id,
-            title: `Новый план от ${item.creator_name || item.creator_login || 'участника'}`,
-            body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}${item.end_time ? '–' + String(item.end_time).slice(0,5) : ''}`,
-            meta: 'Откройте календарь, чтобы посмотреть день',
-            createdAtTs: createdTs,
-          });
-          showBrowserNotification(`Новый план · ${item.creator_name || item.creator_login || ''}`, { body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}` });
-        }
+    for (const id of changes.deletedProposals) delete knownProposals[String(id)];
+    for (const id of changes.deletedEvents) delete knownPlans[String(id)];
+    for (const item of changes.events){
+      const key = String(item.id);
+      const createdTs = Date.parse(item.created_at || '') || Date.now();
+      const isKnown = !!knownPlans[key];
+      knownPlans[key] = createdTs;
+      if (!isKnown && Number(item.user_id) !== Number(currentUser.id) && plansEnabled()){
+        addFeedItem({
+          type: 'plan',
+          entityId: item.id,
+          groupId: item.group_id,
+          title: `Новый план от ${item.creator_name || item.creator_login || 'участника'}`,
+          body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}${item.end_time ? '–' + String(item.end_time).slice(0,5) : ''}`,
+          meta: 'Откройте календарь, чтобы посмотреть день',
+          createdAtTs: createdTs,
+        });
+        showBrowserNotification(`Новый план · ${item.creator_name || item.creator_login || ''}`, { body: `${item.title || 'Без названия'} · ${formatDateTime(item.date, item.start_time)}` });
       }
     }
     setKnownMap(KEYS.proposalKnown, knownProposals);
@@ -253,6 +283,48 @@ async function pollNotifications(){
   }catch{}
   await refreshBadges();
 }
+function schedulePoll(){
+  clearTimeout(pollDebounce);
+  pollDebounce = setTimeout(pollNotifications, 300);
+}
+function startPolling(){
+  if (!pollTimer) pollTimer = setInterval(pollNotifications, 25000);
+}
+function stopPolling(){
+  if (pollTimer) clearInterval(pollTimer);
+  pollTimer = null;
+}
+function scheduleStreamReconnect(){
+  clearTimeout(streamRetryTimer);
+  streamRetryTimer = setTimeout(() => { if (!connectChangeStream()) scheduleStreamReconnect(); }, streamRetryDelay);
+  streamRetryDelay = Math.min(streamRetryDelay * 2, 60000);
+}
+function connectChangeStream(){
+  // The stream only signals that something changed; pollNotifications pulls the delta from /api/sync.
+  const token = getToken();
+  if (!('EventSource' in window) || !token) return false;
+  if (changeStream) changeStream.close();
+  const stream = new EventSource(`${getApiBase()}/api/stream?token=${encodeURIComponent(token)}`);
+  changeStream = stream;
+  stream.addEventListener('change', schedulePoll);
+  stream.addEventListener('resync', schedulePoll);
+  stream.addEventListener('open', () => {
+    streamRetryDelay = 5000;
+    stopPolling();
+    schedulePoll();
+  });
+  stream.addEventListener('error', () => {
+    // Poll while the stream is down. The token sits in the URL, so once it expires the
+    // browser's own reconnect gets a 401 and gives up; reconnect with a fresh token then.
+    if (changeStream !== stream) return;
+    startPolling();
+    if (stream.readyState === EventSource.CLOSED){
+      changeStream = null;
+      scheduleStreamReconnect();
+    }
+  });
+  return true;
+}
 function bindToggles(){
   ensureCheckbox('notifMaster', masterEnabled());
   ensureCheckbox('notifPlans', plansEnabled());
@@ -292,6 +364,6 @@ export function initProposalNotifications(){
   document.addEventListener('meeting:updated', () => setTimeout(pollNotifications, 200));
   document.querySelectorAll('.tab[data-tab="friends"]').forEach(tab => tab.addEventListener('click', () => { if (activeGroupId) markGroupSeen(activeGroupId); }));
   setTimeout(pollNotifications, 700);
-  if (pollTimer) clearInterval(pollTimer);
-  pollTimer = setInterval(pollNotifications, 25000);
+  stopPolling();
+  if (!connectChangeStream()) startPolling();
 }